@@ -0,0 +1,106 @@
+"""
+Benchmark parse_config on a taxonomy-style label config with many nested choices
+against the previous implementation, which walked up the ancestors of every label.
+
+Usage: python benchmarks/parse_config_large.py [labels] [depth]
+"""
+import os
+import sys
+import timeit
+
+from collections import defaultdict
+
+from lxml import etree
+
+# run from a source checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from label_studio_tools.core.label_config import has_variable, parse_config  # noqa: E402
+from label_studio_tools.core.tags import _LABEL_TAGS, _NOT_CONTROL_TAGS  # noqa: E402
+
+
+def make_config(labels=50000, depth=5):
+    choices = ''.join(f'<Choice value="choice_{i}"/>' for i in range(labels))
+    nested = '<View>' * depth + choices + '</View>' * depth
+    return (
+        '<View><Text name="text" value="$text"/>'
+        f'<Choices name="taxonomy" toName="text">{nested}</Choices>'
+        '</View>'
+    )
+
+
+def ancestor_walk_parse_config(config_string):
+    """
+    parse_config before the single-pass traversal: the control tag of every label
+    is found by walking up its ancestors with getparent()
+    """
+    xml_tree = etree.fromstring(config_string)
+    inputs, outputs, labels = {}, {}, defaultdict(dict)
+    variables = []
+    for tag in xml_tree.iter():
+        if tag.attrib and 'indexFlag' in tag.attrib:
+            variables.append(tag.attrib['indexFlag'])
+        if (
+            tag.attrib.get('name')
+            and tag.attrib.get('toName')
+            and tag.tag not in _NOT_CONTROL_TAGS
+        ):
+            tag_info = {'type': tag.tag, 'to_name': tag.attrib['toName'].split(',')}
+            for v in variables:
+                for tag_name in tag_info['to_name']:
+                    if v in tag_name:
+                        tag_info.setdefault('regex', {})[v] = ".*"
+            if has_variable(tag.attrib.get("value", "")) or tag.attrib.get("apiUrl"):
+                tag_info['dynamic_labels'] = True
+            outputs[tag.attrib['name']] = tag_info
+        elif tag.attrib.get('name') and tag.attrib.get('value'):
+            inputs[tag.attrib['name']] = {
+                'type': tag.tag,
+                'value': tag.attrib['value'].lstrip('$'),
+            }
+        if tag.tag not in _LABEL_TAGS:
+            continue
+        parent, parent_name = tag, None
+        while True:
+            parent = parent.getparent()
+            if parent is None:
+                break
+            if parent.attrib.get('name') in outputs:
+                parent_name = parent.attrib.get('name')
+                break
+        if parent_name is not None:
+            actual_value = tag.attrib.get('alias') or tag.attrib.get('value')
+            if actual_value:
+                labels[parent_name][actual_value] = dict(tag.attrib)
+    for output_tag, tag_info in outputs.items():
+        tag_info['inputs'] = [
+            inputs[name] for name in tag_info['to_name'] if name in inputs
+        ]
+        tag_info['labels'] = list(labels[output_tag])
+        tag_info['labels_attrs'] = labels[output_tag]
+    return outputs
+
+
+def main():
+    labels = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    config = make_config(labels, depth)
+    assert ancestor_walk_parse_config(config) == parse_config(config)
+    assert len(parse_config(config)['taxonomy']['labels']) == labels
+    runs = 5
+    timings = {}
+    for name, parse in (
+        ('ancestor walk (before)', ancestor_walk_parse_config),
+        ('parse_config', parse_config),
+    ):
+        timings[name] = min(timeit.repeat(lambda: parse(config), number=1, repeat=runs))
+        print(
+            f'{name}: {labels} labels, depth {depth}: '
+            f'{timings[name] * 1000:.1f} ms (best of {runs})'
+        )
+    before, after = timings.values()
+    print(f'speedup: {before / after:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,64 @@
+import hashlib
+import io
+import json
 import logging
+import os
 import re
+import tempfile
+import threading
 
-from collections import defaultdict
+from collections import defaultdict, namedtuple, OrderedDict
+from collections.abc import Mapping
+from functools import lru_cache
 from lxml import etree
+from types import MappingProxyType
 
 from label_studio_tools.core.utils.exceptions import (
     LabelStudioXMLSyntaxErrorSentryIgnored,
 )
+from label_studio_tools.core.tags import (
+    _LABEL_TAGS,
+    _NOT_CONTROL_TAGS,
+    _VIDEO_TRACKING_TAGS,
+)
 
 logger = logging.getLogger(__name__)
 
-_LABEL_TAGS = {'Label', 'Choice', 'Relation'}
-_NOT_CONTROL_TAGS = {
-    'Filter',
-}
 _DIR_APP_NAME = 'label-studio'
-_VIDEO_TRACKING_TAGS = {'videorectangle'}
+_VARIABLE_PATTERN = re.compile(r'^\$[A-Za-z_]+$')
+
+# bump it when parse_config output or the disk cache layout changes
+_DISK_CACHE_FORMAT_VERSION = 2
+
+# whitespace-only text and comments don't change parse_config output
+_CANONICAL_PARSER = etree.XMLParser(remove_blank_text=True, remove_comments=True)
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+ConfigDiff = namedtuple(
+    'ConfigDiff',
+    [
+        'added_controls',
+        'removed_controls',
+        'changed_controls',
+        'added_inputs',
+        'removed_inputs',
+        'added_labels',
+        'removed_labels',
+        'changed_labels',
+    ],
+)
 
 
-def parse_config(config_string):
+def parse_config(config_string, collect_labels_attrs=True, streaming=False):
     """Parse a given Label Studio labeling configuration and return a structured version of the configuration.
     Useful for formatting results for predicted annotations and determining the type(s) of ML models that might
     be relevant to the labeling project.
 
     :param config_string: Label config string
+    :param collect_labels_attrs: Collect attributes of every label into "labels_attrs",
+      if False, "labels_attrs" is not added to the output
+    :param streaming: Parse with etree.iterparse and drop processed tags instead of building the whole XML tree,
+      see parse_config_stream
     :return: structured config of the form:
     {
         "<ControlTag>.name": {
@@ -38,57 +73,164 @@ def parse_config(config_string):
     """
     if not config_string:
         return {}
+    if streaming:
+        return parse_config_stream(
+            io.BytesIO(config_string.encode()), collect_labels_attrs
+        )
 
     try:
         xml_tree = etree.fromstring(config_string)
     except etree.XMLSyntaxError as e:
         raise LabelStudioXMLSyntaxErrorSentryIgnored(str(e))
-    inputs, outputs, labels = {}, {}, defaultdict(dict)
-    # Add variables to config (e.g. {{idx}} for index in Repeater
-    variables = []
-    for tag in xml_tree.iter():
-        if tag.attrib and 'indexFlag' in tag.attrib:
-            variables.append(tag.attrib['indexFlag'])
-        if _is_output_tag(tag):
-            tag_info = {'type': tag.tag, 'to_name': tag.attrib['toName'].split(',')}
-            if variables:
-                # Find variables in tag_name and regex if find it
-                for v in variables:
-                    for tag_name in tag_info['to_name']:
-                        if v in tag_name:
-                            if 'regex' not in tag_info:
-                                tag_info['regex'] = {}
-                            tag_info['regex'][v] = ".*"
-            # Grab conditionals if any
-            conditionals = {}
-            if tag.attrib.get('perRegion') == 'true':
-                if tag.attrib.get('whenTagName'):
-                    conditionals = {'type': 'tag', 'name': tag.attrib['whenTagName']}
-                elif tag.attrib.get('whenLabelValue'):
-                    conditionals = {
-                        'type': 'label',
-                        'name': tag.attrib['whenLabelValue'],
-                    }
-                elif tag.attrib.get('whenChoiceValue'):
-                    conditionals = {
-                        'type': 'choice',
-                        'name': tag.attrib['whenChoiceValue'],
-                    }
-            if conditionals:
-                tag_info['conditionals'] = conditionals
-            if has_variable(tag.attrib.get("value", "")) or tag.attrib.get("apiUrl"):
-                tag_info['dynamic_labels'] = True
-            outputs[tag.attrib['name']] = tag_info
-        elif _is_input_tag(tag):
-            inputs[tag.attrib['name']] = {
-                'type': tag.tag,
-                'value': tag.attrib['value'].lstrip('$'),
+    return _parse_tree(xml_tree, collect_labels_attrs)
+
+
+def _parse_tree(xml_tree, collect_labels_attrs=True):
+    # single traversal: the enclosing control tag is carried down the tree
+    # instead of looking for it among ancestors of every label
+    builder = _ParsedConfigBuilder(collect_labels_attrs)
+    for event, tag in etree.iterwalk(xml_tree, events=('start', 'end')):
+        if event == 'start':
+            builder.start(tag)
+        else:
+            builder.end(tag)
+    return builder.build()
+
+
+def parse_configs(configs, workers=1, chunksize=8):
+    """
+    Parse many label configs at once, e.g. configs of all projects on startup.
+    Every distinct config string is parsed once, projects with configs differing only in whitespace
+    and comments (same canonical_config_hash) share the parsed config.
+    :param configs: Dict of project → label config string
+    :param workers: Number of worker processes parsing distinct configs,
+      1 parses them in the current process, None uses CPU count
+    :param chunksize: Number of configs sent to a worker at once
+    :return: Dict of project → parse_config output. Projects with equivalent configs share the same
+      parsed config object, copy it before changing
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunksize < 1:
+        raise ValueError(f'chunksize must be positive, got {chunksize}')
+    distinct = list(dict.fromkeys(configs.values()))
+    # canonical hash of every distinct config string and parsed config of every canonical hash
+    hashes, parsed = {}, {}
+    if workers == 1 or len(distinct) <= chunksize:
+        for config_string in distinct:
+            xml_tree, canonical = _canonicalize_config(config_string)
+            hashes[config_string] = canonical
+            if canonical not in parsed:
+                # the XML tree is already built, don't parse the string again
+                parsed[canonical] = (
+                    _parse_tree(xml_tree) if xml_tree is not None else {}
+                )
+    else:
+        # multiprocessing is slow to import, load it only when a pool is needed
+        from concurrent.futures import ProcessPoolExecutor
+
+        # workers build the XML tree once for both the hash and the parsed config,
+        # nothing is parsed in the current process
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for config_string, (canonical, parsed_config) in zip(
+                distinct,
+                executor.map(_parse_canonical_config, distinct, chunksize=chunksize),
+            ):
+                hashes[config_string] = canonical
+                parsed.setdefault(canonical, parsed_config)
+    return {
+        project: parsed[hashes[config_string]]
+        for project, config_string in configs.items()
+    }
+
+
+def _parse_canonical_config(config_string):
+    xml_tree, canonical = _canonicalize_config(config_string)
+    return canonical, _parse_tree(xml_tree) if xml_tree is not None else {}
+
+
+def canonical_config_hash(config_string):
+    """
+    Hash of the label config ignoring whitespace between tags, comments and attribute order:
+    configs with the same canonical hash have the same parse_config output
+    :param config_string: Label config string
+    :return: sha256 hex digest
+    """
+    return _canonicalize_config(config_string)[1]
+
+
+def _canonicalize_config(config_string):
+    if not config_string:
+        return None, config_hash('')
+    try:
+        xml_tree = etree.fromstring(config_string, _CANONICAL_PARSER)
+    except etree.XMLSyntaxError as e:
+        raise LabelStudioXMLSyntaxErrorSentryIgnored(str(e))
+    canonical = etree.tostring(xml_tree, method='c14n')
+    return xml_tree, hashlib.sha256(canonical).hexdigest()
+
+
+def parse_config_stream(source, collect_labels_attrs=True):
+    """Streaming version of parse_config for very large label configs:
+    the XML is read incrementally with etree.iterparse and tags are cleared right after they are processed.
+    With collect_labels_attrs=False memory depends on the number of control and object tags,
+    not on the number of labels (except the labels lists).
+
+    :param source: File path or binary file object with label config
+    :param collect_labels_attrs: Collect attributes of every label into "labels_attrs"
+    :return: structured config, see parse_config
+    """
+    builder = _ParsedConfigBuilder(collect_labels_attrs)
+    try:
+        for event, tag in etree.iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                builder.start(tag)
+                continue
+            builder.end(tag)
+            # processed tags and their previous siblings aren't needed anymore
+            tag.clear()
+            parent = tag.getparent()
+            if parent is not None:
+                while tag.getprevious() is not None:
+                    del parent[0]
+    except etree.XMLSyntaxError as e:
+        raise LabelStudioXMLSyntaxErrorSentryIgnored(str(e))
+    return builder.build()
+
+
+class _ParsedConfigBuilder:
+    """
+    Collect parse_config output from start/end events of label config tags in document order
+    """
+
+    def __init__(self, collect_labels_attrs=True):
+        self.collect_labels_attrs = collect_labels_attrs
+        self.inputs, self.outputs, self.labels = {}, {}, defaultdict(dict)
+        # Add variables to config (e.g. {{idx}} for index in Repeater
+        self.variables = []
+        # [tag name, name of the closest enclosing output tag] for every open tag
+        self._open_tags = []
+        self._open_names = defaultdict(int)
+
+    def start(self, tag):
+        # lxml creates new objects on every attribute access, so attributes are read once
+        attrib, tag_type = dict(tag.attrib), tag.tag
+        name = attrib.get('name')
+        if 'indexFlag' in attrib:
+            self.variables.append(attrib['indexFlag'])
+        if _is_output_tag(tag_type, attrib):
+            self.outputs[name] = self._output_tag_info(tag_type, attrib)
+            if self._open_names[name]:
+                # an open tag has the same name as the new output tag
+                self._resolve_open_tags()
+        elif _is_input_tag(attrib):
+            self.inputs[name] = {
+                'type': tag_type,
+                'value': attrib['value'].lstrip('$'),
             }
-        if tag.tag not in _LABEL_TAGS:
-            continue
-        parent_name = _get_parent_output_tag_name(tag, outputs)
-        if parent_name is not None:
-            actual_value = tag.attrib.get('alias') or tag.attrib.get('value')
+
+        parent_name = self._open_tags[-1][1] if self._open_tags else None
+        if tag_type in _LABEL_TAGS and parent_name is not None:
+            actual_value = attrib.get('alias') or attrib.get('value')
             if not actual_value:
                 logger.debug(
                     'Inspecting tag {tag_name}... found no "value" or "alias" attributes.'.format(
@@ -96,23 +238,516 @@ def parse_config(config_string):
                     )
                 )
             else:
-                labels[parent_name][actual_value] = dict(tag.attrib)
-    for output_tag, tag_info in outputs.items():
-        tag_info['inputs'] = []
-        for input_tag_name in tag_info['to_name']:
-            if input_tag_name not in inputs:
-                logger.info(
-                    f'to_name={input_tag_name} is specified for output tag name={output_tag}, '
-                    'but we can\'t find it among input tags'
+                self.labels[parent_name][actual_value] = (
+                    attrib if self.collect_labels_attrs else None
                 )
-                continue
-            tag_info['inputs'].append(inputs[input_tag_name])
-        tag_info['labels'] = list(labels[output_tag])
-        tag_info['labels_attrs'] = labels[output_tag]
-    return outputs
+
+        self._open_tags.append([name, name if name in self.outputs else parent_name])
+        self._open_names[name] += 1
+
+    def end(self, tag):
+        name, _ = self._open_tags.pop()
+        self._open_names[name] -= 1
+
+    def _resolve_open_tags(self):
+        parent_name = None
+        for open_tag in self._open_tags:
+            if open_tag[0] in self.outputs:
+                parent_name = open_tag[0]
+            open_tag[1] = parent_name
+
+    def _output_tag_info(self, tag_type, attrib):
+        tag_info = {'type': tag_type, 'to_name': attrib['toName'].split(',')}
+        if self.variables:
+            # Find variables in tag_name and regex if find it
+            regex = {
+                v: ".*"
+                for v in self.variables
+                if any(v in tag_name for tag_name in tag_info['to_name'])
+            }
+            if regex:
+                tag_info['regex'] = regex
+        # Grab conditionals if any
+        conditionals = {}
+        if attrib.get('perRegion') == 'true':
+            if attrib.get('whenTagName'):
+                conditionals = {'type': 'tag', 'name': attrib['whenTagName']}
+            elif attrib.get('whenLabelValue'):
+                conditionals = {
+                    'type': 'label',
+                    'name': attrib['whenLabelValue'],
+                }
+            elif attrib.get('whenChoiceValue'):
+                conditionals = {
+                    'type': 'choice',
+                    'name': attrib['whenChoiceValue'],
+                }
+        if conditionals:
+            tag_info['conditionals'] = conditionals
+        if has_variable(attrib.get("value", "")) or attrib.get("apiUrl"):
+            tag_info['dynamic_labels'] = True
+        return tag_info
+
+    def build(self):
+        outputs = self.outputs
+        for output_tag, tag_info in outputs.items():
+            tag_info['inputs'] = []
+            for input_tag_name in tag_info['to_name']:
+                if input_tag_name not in self.inputs:
+                    logger.info(
+                        f'to_name={input_tag_name} is specified for output tag name={output_tag}, '
+                        'but we can\'t find it among input tags'
+                    )
+                    continue
+                tag_info['inputs'].append(self.inputs[input_tag_name])
+            tag_info['labels'] = list(self.labels[output_tag])
+            if self.collect_labels_attrs:
+                tag_info['labels_attrs'] = self.labels[output_tag]
+        return outputs
+
+
+class ParseConfigCache:
+    """
+    LRU cache of parse_config results keyed by the config content hash.
+    Every call returns a new copy of the parsed config, so callers can mutate it freely.
+    """
+
+    def __init__(self, maxsize=128, disk_cache=None):
+        """
+        :param maxsize: Max number of cached configs
+        :param disk_cache: DiskParseConfigCache used on misses before parsing the config
+        """
+        self.maxsize = maxsize
+        self.disk_cache = disk_cache
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def parse(self, config_string):
+        """
+        Cached version of parse_config
+        :param config_string: Label config string
+        :return: structured config, see parse_config
+        """
+        key = config_hash(config_string)
+        with self._lock:
+            parsed = self._cache.get(key)
+            if parsed is not None:
+                self._cache.move_to_end(key)
+                self._hits += 1
+            else:
+                self._misses += 1
+        if parsed is None:
+            if self.disk_cache is not None:
+                parsed = self.disk_cache.parse(config_string)
+            else:
+                parsed = parse_config(config_string)
+            with self._lock:
+                self._cache[key] = parsed
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+        return _copy_parsed_config(parsed)
+
+    def info(self):
+        """
+        :return: CacheInfo(hits, misses, maxsize, currsize)
+        """
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self.maxsize, len(self._cache))
+
+    def clear(self):
+        """
+        Remove all cached configs and reset statistics
+        """
+        with self._lock:
+            self._cache.clear()
+            self._hits = 0
+            self._misses = 0
+
+
+class DiskParseConfigCache:
+    """
+    Persistent cache of parse_config results, so new processes don't parse the same configs again.
+    Parsed configs are stored as JSON (never unpickled, so cache files can't execute code) in
+    <cache dir>/<format version>-<library version>-<parser source hash>/<config hash>.json,
+    files are written atomically, so the cache can be shared by many processes.
+    """
+
+    def __init__(self, cache_dir=None):
+        """
+        :param cache_dir: Cache directory, "parsed-configs" in get_cache_dir() by default
+        """
+        self._cache_dir = cache_dir
+        self._path = None
+
+    @property
+    def path(self):
+        """
+        Directory with cached configs of the current library version and parser code
+        """
+        if self._path is None:
+            cache_dir = self._cache_dir
+            if cache_dir is None:
+                # io pulls in requests, import it only when the default cache dir is needed
+                from label_studio_tools.core.utils.io import get_cache_dir
+
+                cache_dir = os.path.join(get_cache_dir(), 'parsed-configs')
+            path = os.path.join(
+                cache_dir,
+                f'{_DISK_CACHE_FORMAT_VERSION}-{_library_version()}-{_parser_source_hash()}',
+            )
+            os.makedirs(path, exist_ok=True)
+            self._path = path
+        return self._path
+
+    def get(self, config_string):
+        """
+        :param config_string: Label config string
+        :return: Cached parse_config output or None if the config isn't cached
+        """
+        try:
+            # the cache directory is created here, so it can fail as well
+            with open(self._filepath(config_string), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            # the cache is an optimization, an unusable cache dir or a broken file means a miss
+            logger.debug(f'Skip parsed config cache: {e}')
+            return None
+
+    def set(self, config_string, parsed_config):
+        """
+        :param config_string: Label config string
+        :param parsed_config: parse_config output for this config
+        """
+        try:
+            filepath = self._filepath(config_string)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(
+                        parsed_config, f, ensure_ascii=False, separators=(',', ':')
+                    )
+                os.replace(tmp_path, filepath)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            # the cache is an optimization, a read-only or full disk must not break parsing
+            logger.debug(f'Can\'t write parsed config cache: {e}')
+
+    def parse(self, config_string):
+        """
+        Cached version of parse_config
+        :param config_string: Label config string
+        :return: structured config, see parse_config
+        """
+        parsed = self.get(config_string)
+        if parsed is None:
+            parsed = parse_config(config_string)
+            self.set(config_string, parsed)
+        return parsed
+
+    def clear(self):
+        """
+        Remove cached configs of the current library version
+        """
+        for name in os.listdir(self.path):
+            try:
+                os.unlink(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+
+    def _filepath(self, config_string):
+        return os.path.join(self.path, config_hash(config_string) + '.json')
+
+
+def _library_version():
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:  # python < 3.8
+        return 'unknown'
+    try:
+        return version('label-studio-tools')
+    except PackageNotFoundError:
+        return 'unknown'
+
+
+def _parser_source_hash():
+    # source checkouts have no installed version, so parser changes are detected by its source code
+    digest = hashlib.sha256()
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    for filename in ('label_config.py', 'tags.py'):
+        try:
+            with open(os.path.join(module_dir, filename), 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(filename.encode())
+    return digest.hexdigest()[:12]
+
+
+_parse_config_cache = ParseConfigCache()
+
+
+def parse_config_cached(config_string):
+    """
+    Same as parse_config, but results are cached in a process wide LRU cache
+    :param config_string: Label config string
+    :return: structured config, see parse_config
+    """
+    return _parse_config_cache.parse(config_string)
+
+
+def parse_config_cache_info():
+    """
+    :return: CacheInfo(hits, misses, maxsize, currsize) of parse_config_cached
+    """
+    return _parse_config_cache.info()
+
+
+def parse_config_cache_clear():
+    _parse_config_cache.clear()
+
+
+def parse_config_cache_set_disk_cache(disk_cache):
+    """
+    Use a persistent cache for misses of parse_config_cached
+    :param disk_cache: DiskParseConfigCache or None to disable it
+    """
+    _parse_config_cache.disk_cache = disk_cache
+
+
+def config_hash(config_string):
+    """
+    Content hash of the label config string
+    :param config_string: Label config string
+    :return: sha256 hex digest
+    """
+    return hashlib.sha256((config_string or '').encode()).hexdigest()
+
+
+class LabelConfig(Mapping):
+    """
+    Compiled, immutable label config: a read-only mapping of control tag names to their parse_config info
+    with precomputed lookup indexes. Lists of parse_config output are tuples and dicts are read-only here.
+    """
+
+    __slots__ = (
+        '_controls',
+        '_controls_by_type',
+        '_controls_by_label',
+        '_controls_by_input_value',
+        '_controls_by_to_name',
+        '_to_name_patterns',
+        'is_video_tracking',
+        'has_dynamic_labels',
+    )
+
+    def __init__(self, config_string):
+        """
+        :param config_string: Label config string
+        """
+        self._init(parse_config(config_string))
+
+    @classmethod
+    def from_parsed(cls, parsed_config):
+        """
+        Compile parse_config output
+        :param parsed_config: Structured config from parse_config
+        :return: LabelConfig
+        """
+        label_config = cls.__new__(cls)
+        label_config._init(parsed_config)
+        return label_config
+
+    def _init(self, parsed_config):
+        by_type, by_label, by_input_value, by_to_name = (
+            defaultdict(list),
+            defaultdict(list),
+            defaultdict(list),
+            defaultdict(list),
+        )
+        to_name_patterns = []
+        for name, tag_info in parsed_config.items():
+            by_type[tag_info['type'].lower()].append(name)
+            if tag_info.get('regex'):
+                to_name_patterns.append((name, to_name_pattern(tag_info)))
+            else:
+                for to_name in tag_info['to_name']:
+                    if name not in by_to_name[to_name]:
+                        by_to_name[to_name].append(name)
+            for label in tag_info.get('labels', []):
+                by_label[label].append(name)
+            for input_tag in tag_info.get('inputs', []):
+                if name not in by_input_value[input_tag['value']]:
+                    by_input_value[input_tag['value']].append(name)
+        set_attr = super().__setattr__
+        set_attr('_controls', _freeze(parsed_config))
+        set_attr('_controls_by_type', _freeze(by_type))
+        set_attr('_controls_by_label', _freeze(by_label))
+        set_attr('_controls_by_input_value', _freeze(by_input_value))
+        set_attr('_controls_by_to_name', _freeze(by_to_name))
+        set_attr('_to_name_patterns', tuple(to_name_patterns))
+        set_attr('is_video_tracking', any(t in by_type for t in _VIDEO_TRACKING_TAGS))
+        set_attr(
+            'has_dynamic_labels',
+            any(info.get('dynamic_labels') for info in parsed_config.values()),
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __getitem__(self, name):
+        return self._controls[name]
+
+    def __iter__(self):
+        return iter(self._controls)
+
+    def __len__(self):
+        return len(self._controls)
+
+    def __repr__(self):
+        return f'<LabelConfig controls={list(self._controls)}>'
+
+    def inputs_of(self, control_name):
+        """
+        :param control_name: Control tag name
+        :return: Tuple of input tags ({"type": ..., "value": ...}) of the control tag
+        """
+        return self._controls[control_name]['inputs']
+
+    def controls_of_type(self, tag_type):
+        """
+        :param tag_type: Control tag type, case insensitive, e.g. "Choices" or "rectanglelabels"
+        :return: Tuple of control tag names
+        """
+        return self._controls_by_type.get(tag_type.lower(), ())
+
+    def controls_for_label(self, label):
+        """
+        :param label: Label value (or alias)
+        :return: Tuple of control tag names having this label
+        """
+        return self._controls_by_label.get(label, ())
+
+    def controls_for_input_value(self, value):
+        """
+        :param value: Input tag value key, e.g. "image" for value="$image"
+        :return: Tuple of control tag names connected to input tags with this value
+        """
+        return self._controls_by_input_value.get(value.lstrip('$'), ())
+
+    def controls_for_to_name(self, to_name):
+        """
+        :param to_name: Input tag name, dynamic Repeater names like "image_5" are resolved
+          with precompiled patterns of their control tags
+        :return: Tuple of control tag names connected to this input tag name
+        """
+        controls = self._controls_by_to_name.get(to_name, ())
+        if not self._to_name_patterns:
+            return controls
+        return controls + tuple(
+            name
+            for name, pattern in self._to_name_patterns
+            if pattern.fullmatch(to_name)
+        )
+
+    def to_name_matcher(self, control_name):
+        """
+        :param control_name: Control tag name
+        :return: Compiled pattern matching every to_name of the control tag, see to_name_pattern
+        """
+        return to_name_pattern(self._controls[control_name])
+
+    def to_dict(self):
+        """
+        :return: parse_config output for this config, a new mutable copy
+        """
+        return _copy_parsed_config(self._controls)
+
+
+def diff_configs(old_config, new_config):
+    """
+    Structural diff of two parsed label configs, so caches built from the old config
+    can be invalidated only for the affected control tags
+    :param old_config: parse_config output or LabelConfig
+    :param new_config: parse_config output or LabelConfig
+    :return: ConfigDiff where
+      added_controls, removed_controls: names of control tags existing only in the new/old config;
+      changed_controls: names of control tags existing in both configs with any difference in their info;
+      added_inputs, removed_inputs: dicts of changed control tag name → list of its added/removed input tags;
+      added_labels, removed_labels: dicts of changed control tag name → list of its added/removed labels;
+      changed_labels: dicts of changed control tag name → list of labels with changed attributes.
+      Empty lists are not included, all lists keep the config order
+    """
+    old_config, new_config = _config_as_dict(old_config), _config_as_dict(new_config)
+    diff = ConfigDiff(
+        [name for name in new_config if name not in old_config],
+        [name for name in old_config if name not in new_config],
+        [],
+        {},
+        {},
+        {},
+        {},
+        {},
+    )
+    for name, new_info in new_config.items():
+        old_info = old_config.get(name)
+        if old_info is None or old_info == new_info:
+            continue
+        diff.changed_controls.append(name)
+        old_inputs, new_inputs = old_info.get('inputs', []), new_info.get('inputs', [])
+        _add_diff(
+            diff.added_inputs, name, [i for i in new_inputs if i not in old_inputs]
+        )
+        _add_diff(
+            diff.removed_inputs, name, [i for i in old_inputs if i not in new_inputs]
+        )
+        old_labels, new_labels = old_info.get('labels', []), new_info.get('labels', [])
+        old_labels_set, new_labels_set = set(old_labels), set(new_labels)
+        _add_diff(
+            diff.added_labels,
+            name,
+            [label for label in new_labels if label not in old_labels_set],
+        )
+        _add_diff(
+            diff.removed_labels,
+            name,
+            [label for label in old_labels if label not in new_labels_set],
+        )
+        old_attrs = old_info.get('labels_attrs') or {}
+        new_attrs = new_info.get('labels_attrs') or {}
+        _add_diff(
+            diff.changed_labels,
+            name,
+            [
+                label
+                for label in new_labels
+                if label in old_labels_set
+                and old_attrs.get(label) != new_attrs.get(label)
+            ],
+        )
+    return diff
+
+
+def _config_as_dict(config):
+    if isinstance(config, LabelConfig):
+        # frozen lists are tuples, which are never equal to lists
+        return config.to_dict()
+    return config
+
+
+def _add_diff(diff, name, values):
+    if values:
+        diff[name] = values
 
 
 def is_video_object_tracking(parsed_config):
+    if isinstance(parsed_config, LabelConfig):
+        return parsed_config.is_video_tracking
     for component in parsed_config:
         if parsed_config[component]['type'].lower() in _VIDEO_TRACKING_TAGS:
             return True
@@ -124,39 +759,84 @@ def has_variable(actual_value):
     :param actual_value: value to check
     :return: True if value has variable
     """
-    expression = "^\$[A-Za-z_]+$"
-    pattern = re.compile(expression)
-    full_match = pattern.fullmatch(actual_value)
-    if full_match:
-        return True
-    return False
+    return _VARIABLE_PATTERN.fullmatch(actual_value) is not None
+
+
+def to_name_pattern(tag_info):
+    """
+    Compile a regular expression matching every to_name of a control tag,
+    Repeater variables (e.g. {{idx}} in image_{{idx}}) are replaced with their "regex" from parse_config.
+    Patterns are cached, so it's cheap to call it for the same control tag many times.
+    :param tag_info: Control tag info from parse_config
+    :return: Compiled pattern, use it with fullmatch
+    """
+    return _compile_name_pattern(
+        tuple(tag_info['to_name']), tuple((tag_info.get('regex') or {}).items())
+    )
+
+
+def from_name_pattern(name, tag_info):
+    """
+    Compile a regular expression matching instantiated names of a Repeater control tag,
+    e.g. choice_5 for choice_{{idx}}, variables are replaced with their "regex" from parse_config
+    :param name: Control tag name from parse_config
+    :param tag_info: Control tag info from parse_config
+    :return: Compiled pattern, use it with fullmatch, or None if the name has no variables
+    """
+    regex = tuple(
+        (variable, variable_regex)
+        for variable, variable_regex in (tag_info.get('regex') or {}).items()
+        if variable in name
+    )
+    if not regex:
+        return None
+    return _compile_name_pattern((name,), regex)
 
 
-def _is_input_tag(tag):
+@lru_cache(maxsize=1024)
+def _compile_name_pattern(names, regex):
+    alternatives = []
+    for name in names:
+        alternative = re.escape(name)
+        for variable, variable_regex in regex:
+            alternative = alternative.replace(
+                re.escape(variable), f'(?:{variable_regex})'
+            )
+        alternatives.append(alternative)
+    return re.compile('|'.join(f'(?:{a})' for a in alternatives))
+
+
+def _is_input_tag(attrib):
     """
     Check if tag is input
     """
-    return tag.attrib.get('name') and tag.attrib.get('value')
+    return attrib.get('name') and attrib.get('value')
 
 
-def _is_output_tag(tag):
+def _is_output_tag(tag_type, attrib):
     """
     Check if tag is output
     """
     return (
-        tag.attrib.get('name')
-        and tag.attrib.get('toName')
-        and tag.tag not in _NOT_CONTROL_TAGS
+        attrib.get('name')
+        and attrib.get('toName')
+        and tag_type not in _NOT_CONTROL_TAGS
     )
 
 
-def _get_parent_output_tag_name(tag, outputs):
-    # Find parental <Choices> tag for nested tags like <Choices><View><View><Choice>...
-    parent = tag
-    while True:
-        parent = parent.getparent()
-        if parent is None:
-            return
-        name = parent.attrib.get('name')
-        if name in outputs:
-            return name
+def _copy_parsed_config(value):
+    # parsed configs contain only dicts, lists and immutable values, so it's much faster than deepcopy;
+    # frozen LabelConfig values are converted back to dicts and lists
+    if isinstance(value, (dict, MappingProxyType)):
+        return {k: _copy_parsed_config(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_copy_parsed_config(v) for v in value]
+    return value
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
@@ -0,0 +1,7 @@
+# Tag sets shared by label config parsing and postprocessing,
+# kept apart from label_config so postprocessing doesn't import lxml
+_LABEL_TAGS = {'Label', 'Choice', 'Relation'}
+_NOT_CONTROL_TAGS = {
+    'Filter',
+}
+_VIDEO_TRACKING_TAGS = {'videorectangle'}
@@ -2,11 +2,12 @@ import logging
 import io
 import shutil
 import urllib
-import hashlib
-import requests
 import os
+import re
+import threading
 
-from appdirs import user_cache_dir, user_data_dir
+from collections import defaultdict, namedtuple
+from itertools import zip_longest
 from urllib.parse import urlparse, urljoin
 from contextlib import contextmanager
 from tempfile import mkdtemp
@@ -14,22 +15,75 @@ from tempfile import mkdtemp
 from label_studio_tools.core.utils.params import get_env
 
 _DIR_APP_NAME = 'label-studio'
-LOCAL_FILES_DOCUMENT_ROOT = get_env(
-    'LOCAL_FILES_DOCUMENT_ROOT', default=os.path.abspath(os.sep)
+_URL_PREFIXES = (
+    'http://',
+    'https://',
+    's3:',
+    'gs:',
+    'azure-blob:',
+    '/data/',
+    'upload/',
+    '/upload/',
 )
+_SESSION_OPTIONS = {
+    'pool_connections': 10,
+    'pool_maxsize': 10,
+    'retries': 3,
+    'backoff_factor': 0.5,
+    'status_forcelist': (429, 500, 502, 503, 504),
+    # (connect, read) timeouts in seconds
+    'timeout': (10, 60),
+}
+# defaults of download_and_cache, see configure_download
+_DOWNLOAD_OPTIONS = {'chunk_size': 1024 * 1024, 'check_content_length': False}
+# default budgets of the download cache, None is unlimited
+_CACHE_OPTIONS = {'max_bytes': None, 'max_entries': None}
+# names of files created by download_and_cache: <url hash>__<file name>,
+# and of their temp files: .<cache file name>.<pid>.<thread id>.part
+_CACHE_FILE_RE = re.compile(r'[0-9a-f]{8}__.*', re.DOTALL)
+_PART_FILE_RE = re.compile(r'\.([0-9a-f]{8}__.*)\.\d+\.\d+\.part', re.DOTALL)
+_session = None
+_session_lock = threading.Lock()
+# cache file path -> (lock, number of threads using it)
+_key_locks = {}
+_key_locks_lock = threading.Lock()
 
 logger = logging.getLogger(__name__)
 
+PrefetchResult = namedtuple('PrefetchResult', ['paths', 'errors'])
+CacheStats = namedtuple('CacheStats', ['entries', 'bytes', 'max_entries', 'max_bytes'])
+
+
+def get_local_files_document_root():
+    # a value assigned to the module attribute (io.LOCAL_FILES_DOCUMENT_ROOT = ...) wins over the environment
+    root = globals().get('LOCAL_FILES_DOCUMENT_ROOT')
+    if root is not None:
+        return root
+    return get_env('LOCAL_FILES_DOCUMENT_ROOT', default=os.path.abspath(os.sep))
+
+
+def __getattr__(name):
+    # LOCAL_FILES_DOCUMENT_ROOT is read from the environment on access, not on import,
+    # unless it's assigned to the module
+    if name == 'LOCAL_FILES_DOCUMENT_ROOT':
+        return get_local_files_document_root()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
 def concat_urls(base_url, url):
     return base_url.rstrip('/') + '/' + url.lstrip('/')
 
 def get_data_dir():
+    from appdirs import user_data_dir
+
     data_dir = user_data_dir(appname=_DIR_APP_NAME)
     os.makedirs(data_dir, exist_ok=True)
     return data_dir
 
 
 def get_cache_dir():
+    from appdirs import user_cache_dir
+
     cache_dir = user_cache_dir(appname=_DIR_APP_NAME)
     os.makedirs(cache_dir, exist_ok=True)
     return cache_dir
@@ -44,6 +98,8 @@ def get_local_path(
     access_token=None,
     download_resources=True,
     task_id=None,
+    chunk_size=None,
+    check_content_length=None,
 ):
     f"""This helper function is used to download (cache) url and return local path to it.
 
@@ -58,6 +114,8 @@ def get_local_path(
     :param download_resources: Download and cache a file from URL
     :param task_id: Label Studio Task ID, required for cloud storage files 
       because the URL will be rebuilt to `{hostname}/tasks/{task_id}/presign/?fileuri={url}` 
+    :param chunk_size: Size of chunks written to disk in bytes, see configure_download
+    :param check_content_length: Check the downloaded size against Content-Length header, see configure_download
 
     :return: filepath
     """
@@ -92,7 +150,7 @@ def get_local_path(
     # instead of downloading them from LS instance
     if is_local_storage_file:
         filepath = url.split('?d=')[1]
-        filepath = os.path.join(LOCAL_FILES_DOCUMENT_ROOT, filepath)
+        filepath = os.path.join(get_local_files_document_root(), filepath)
         if os.path.exists(filepath):
             logger.debug(f"Local Storage file path exists locally, use it as a local file: {filepath}")
             return filepath
@@ -143,7 +201,8 @@ def get_local_path(
 
     filepath = download_and_cache(
         url, cache_dir, download_resources, hostname, access_token,
-        is_local_storage_file, is_cloud_storage_file
+        is_local_storage_file, is_cloud_storage_file,
+        chunk_size=chunk_size, check_content_length=check_content_length
     )
     return filepath
 
@@ -155,8 +214,26 @@ def download_and_cache(
         hostname,
         access_token,
         is_local_storage_file,
-        is_cloud_storage_file
+        is_cloud_storage_file,
+        chunk_size=None,
+        check_content_length=None,
 ):
+    """Download url to cache_dir if it isn't cached yet, the file is streamed to disk in chunks.
+
+    :param chunk_size: Size of chunks written to disk in bytes, memory usage doesn't depend on the file size,
+      None uses the configure_download value
+    :param check_content_length: Raise IOError if the number of received bytes doesn't match Content-Length header
+      (responses with Content-Encoding are not checked, because their content is decoded),
+      None uses the configure_download value
+    :return: filepath
+    """
+    import hashlib
+
+    if chunk_size is None:
+        chunk_size = _DOWNLOAD_OPTIONS['chunk_size']
+    if check_content_length is None:
+        check_content_length = _DOWNLOAD_OPTIONS['check_content_length']
+
     # File specified by remote URL - download and cache it
     cache_dir = cache_dir or get_cache_dir()
     parsed_url = urlparse(url)
@@ -181,13 +258,396 @@ def download_and_cache(
             if access_token and hostname and parsed_url.netloc == urlparse(hostname).netloc:
                 headers['Authorization'] = 'Token ' + access_token
                 logger.debug('Authorization token is used for download_and_cache')
-            r = requests.get(url, stream=True, headers=headers)
-            r.raise_for_status()
-            with io.open(filepath, mode='wb') as fout:
-                fout.write(r.content)
+            # concurrent requests for the same file in this and other processes wait for one download
+            with _download_lock(filepath):
+                if not os.path.exists(filepath):
+                    _download_to_file(url, filepath, headers, chunk_size, check_content_length)
+            CacheManager(cache_dir).evict(keep=filepath)
+    else:
+        # cache hit: the file becomes the most recently used one
+        CacheManager(cache_dir).touch(filepath)
     return filepath
 
 
+def _download_to_file(url, filepath, headers, chunk_size, check_content_length):
+    r = get_session().get(
+        url, stream=True, headers=headers, timeout=_SESSION_OPTIONS['timeout']
+    )
+    with r:
+        r.raise_for_status()
+        # write to a temp file and rename it, so readers never see partially downloaded files
+        tmp_path = os.path.join(
+            os.path.dirname(filepath),
+            f'.{os.path.basename(filepath)}.{os.getpid()}.{threading.get_ident()}.part',
+        )
+        try:
+            _write_response(r, tmp_path, chunk_size, check_content_length)
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+@contextmanager
+def _download_lock(filepath, blocking=True):
+    """Exclusive lock of the cache file: a lock per file in this process
+    and a file lock in .locks subdirectory of the cache dir for other processes
+
+    :param blocking: Wait for the lock, otherwise give up if it's taken
+    :return: Context manager yielding True if the lock is acquired
+    """
+    with _key_lock(filepath, blocking) as acquired:
+        if not acquired:
+            yield False
+            return
+        try:
+            import fcntl
+        except ImportError:  # Windows: only threads of this process are synchronized
+            yield True
+            return
+        lock_path = _lock_path(filepath)
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        with io.open(lock_path, 'a') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _lock_path(filepath):
+    return os.path.join(os.path.dirname(filepath), '.locks', os.path.basename(filepath) + '.lock')
+
+
+@contextmanager
+def _key_lock(key, blocking=True):
+    # locks are created on demand and removed when nobody waits for them
+    with _key_locks_lock:
+        lock, count = _key_locks.get(key, (None, 0))
+        if lock is None:
+            lock = threading.Lock()
+        _key_locks[key] = (lock, count + 1)
+    try:
+        acquired = lock.acquire(blocking)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+    finally:
+        with _key_locks_lock:
+            lock, count = _key_locks[key]
+            if count == 1:
+                del _key_locks[key]
+            else:
+                _key_locks[key] = (lock, count - 1)
+
+
+def _write_response(r, filepath, chunk_size, check_content_length):
+    size = 0
+    with io.open(filepath, mode='wb') as fout:
+        for chunk in r.iter_content(chunk_size=chunk_size):
+            fout.write(chunk)
+            size += len(chunk)
+    content_length = r.headers.get('Content-Length')
+    if (
+        check_content_length
+        and content_length is not None
+        and 'Content-Encoding' not in r.headers
+        and size != int(content_length)
+    ):
+        raise IOError(
+            f'Incomplete download of {r.url}: got {size} bytes, Content-Length is {content_length}'
+        )
+
+
+def configure_session(**options):
+    """Configure the pooled HTTP session used by download_and_cache and get_local_path,
+    the session is recreated on the next download, so call it before downloads start.
+
+    :param pool_connections: Number of hosts to keep connection pools for
+    :param pool_maxsize: Max number of kept-alive connections per host
+    :param retries: Number of retries on connection errors and status_forcelist responses
+    :param backoff_factor: Retry backoff factor, retries sleep backoff_factor * 2 ** (retry number - 1) seconds
+      or as long as Retry-After header says
+    :param status_forcelist: HTTP status codes to retry
+    :param timeout: Request timeout in seconds, a number or (connect, read) tuple
+    """
+    global _session
+    unknown = set(options) - set(_SESSION_OPTIONS)
+    if unknown:
+        raise TypeError(f'Unknown session options: {sorted(unknown)}')
+    with _session_lock:
+        _SESSION_OPTIONS.update(options)
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def get_session():
+    """Get the module-level requests session with keep-alive connection pools and retries,
+    see configure_session
+
+    :return: requests.Session
+    """
+    global _session
+    session = _session
+    if session is not None:
+        return session
+    with _session_lock:
+        if _session is None:
+            _session = _create_session(_SESSION_OPTIONS)
+        return _session
+
+
+def _create_session(options):
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=options['retries'],
+        backoff_factor=options['backoff_factor'],
+        status_forcelist=options['status_forcelist'],
+        # return the last response after retries, so raise_for_status raises HTTPError as before
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=options['pool_connections'],
+        pool_maxsize=options['pool_maxsize'],
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def configure_download(**options):
+    """Configure defaults of download_and_cache, get_local_path and prefetch.
+
+    :param chunk_size: Size of chunks written to disk in bytes
+    :param check_content_length: Raise IOError if the number of received bytes doesn't match Content-Length header
+    """
+    unknown = set(options) - set(_DOWNLOAD_OPTIONS)
+    if unknown:
+        raise TypeError(f'Unknown download options: {sorted(unknown)}')
+    chunk_size = options.get('chunk_size', _DOWNLOAD_OPTIONS['chunk_size'])
+    if chunk_size is None or chunk_size < 1:
+        raise ValueError(f'chunk_size must be positive, got {chunk_size}')
+    _DOWNLOAD_OPTIONS.update(options)
+
+
+def configure_cache(**options):
+    """Configure default budgets of the download cache, download_and_cache evicts
+    least recently used files when the cache goes over them.
+
+    :param max_bytes: Max total size of cached files in bytes, None is unlimited
+    :param max_entries: Max number of cached files, None is unlimited
+    """
+    unknown = set(options) - set(_CACHE_OPTIONS)
+    if unknown:
+        raise TypeError(f'Unknown cache options: {sorted(unknown)}')
+    _CACHE_OPTIONS.update(options)
+
+
+class CacheManager:
+    """Download cache directory bounded by total size and number of files.
+    Cache hits update access and modification times of files and the least recently used files are evicted first,
+    the order is taken from modification times, so it works on file systems mounted with noatime.
+    Only files named by download_and_cache (<url hash>__<file name>) are cache entries,
+    other files in the directory are never counted or removed.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None, max_entries=None):
+        """
+        :param cache_dir: Cache directory, get_cache_dir() by default
+        :param max_bytes: Max total size of cached files in bytes, configure_cache value by default
+        :param max_entries: Max number of cached files, configure_cache value by default
+        """
+        self.cache_dir = cache_dir or get_cache_dir()
+        self.max_bytes = max_bytes if max_bytes is not None else _CACHE_OPTIONS['max_bytes']
+        self.max_entries = (
+            max_entries if max_entries is not None else _CACHE_OPTIONS['max_entries']
+        )
+
+    def touch(self, filepath):
+        """Mark the cached file as recently used
+
+        :param filepath: Cached file path
+        """
+        try:
+            os.utime(filepath)
+        except OSError as e:
+            logger.debug(f'Can\'t update access time of {filepath}: {e}')
+
+    def stats(self):
+        """
+        :return: CacheStats(entries, bytes, max_entries, max_bytes)
+        """
+        entries = self._entries()
+        return CacheStats(
+            len(entries), sum(size for _, size, _ in entries), self.max_entries, self.max_bytes
+        )
+
+    def evict(self, keep=None):
+        """Remove least recently used files until the cache fits its budgets
+
+        :param keep: File path that is never evicted, e.g. the file that has just been downloaded
+        :return: List of removed file paths
+        """
+        if self.max_bytes is None and self.max_entries is None:
+            return []
+        entries = self._entries()
+        total_entries, total_bytes = len(entries), sum(size for _, size, _ in entries)
+        removed = []
+        for _, size, filepath in sorted(entries):
+            if (self.max_entries is None or total_entries <= self.max_entries) and (
+                self.max_bytes is None or total_bytes <= self.max_bytes
+            ):
+                break
+            if filepath == keep:
+                continue
+            _remove_file(filepath)
+            _remove_file(_lock_path(filepath))
+            removed.append(filepath)
+            total_entries -= 1
+            total_bytes -= size
+        if removed:
+            logger.debug(f'Evicted {len(removed)} files from cache {self.cache_dir}')
+        return removed
+
+    def purge(self):
+        """Remove all cached files, temp files of interrupted downloads and lock files,
+        downloads in progress are not affected
+
+        :return: Number of removed cache entries
+        """
+        entries = self._entries()
+        for _, _, filepath in entries:
+            _remove_file(filepath)
+        for name in os.listdir(self.cache_dir):
+            match = _PART_FILE_RE.fullmatch(name)
+            if match is None:
+                continue
+            # temp files are orphaned if nobody downloads the file now
+            with _download_lock(
+                os.path.join(self.cache_dir, match.group(1)), blocking=False
+            ) as acquired:
+                if acquired:
+                    _remove_file(os.path.join(self.cache_dir, name))
+        lock_dir = os.path.join(self.cache_dir, '.locks')
+        if os.path.isdir(lock_dir):
+            for name in os.listdir(lock_dir):
+                if not name.endswith('.lock'):
+                    continue
+                filepath = os.path.join(self.cache_dir, name[: -len('.lock')])
+                if _CACHE_FILE_RE.fullmatch(os.path.basename(filepath)) is None:
+                    continue
+                with _download_lock(filepath, blocking=False) as acquired:
+                    if acquired:
+                        _remove_file(os.path.join(lock_dir, name))
+        return len(entries)
+
+    def _entries(self):
+        # (modification time, size, path) of cached files
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if _CACHE_FILE_RE.fullmatch(entry.name) is None:
+                    continue
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                except FileNotFoundError:
+                    # removed by another process
+                    continue
+        return entries
+
+
+def _remove_file(filepath):
+    try:
+        os.unlink(filepath)
+    except FileNotFoundError:
+        pass
+
+
+def prefetch(urls_or_tasks, workers=8, per_host_limit=4, data_keys=None, **kwargs):
+    """Download (cache) many files in parallel with the same rules as get_local_path.
+
+    :param urls_or_tasks: Iterable of URLs or Label Studio tasks ({"id": ..., "data": {...}})
+    :param workers: Number of download threads
+    :param per_host_limit: Max number of concurrent downloads from one host,
+      uploaded, local storage and cloud storage files are downloaded from Label Studio hostname
+    :param data_keys: Task data keys with URLs, by default all task data values looking like URLs
+    :param kwargs: get_local_path arguments: cache_dir, project_dir, hostname, image_dir, access_token, download_resources,
+      chunk_size, check_content_length
+    :return: PrefetchResult(paths, errors): dicts of url → local path and url → exception
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    # url → task id, every url is downloaded once
+    urls = {}
+    for item in urls_or_tasks:
+        if isinstance(item, str):
+            urls.setdefault(item, None)
+            continue
+        data = item.get('data', {})
+        keys = data_keys if data_keys is not None else data.keys()
+        for key in keys:
+            value = data.get(key)
+            if isinstance(value, str) and (data_keys is not None or value.startswith(_URL_PREFIXES)):
+                urls.setdefault(value, item.get('id'))
+
+    hostname = (
+        kwargs.get('hostname')
+        or os.getenv('LABEL_STUDIO_URL', '')
+        or os.getenv('LABEL_STUDIO_HOST', '')
+    )
+    hosts = {url: _url_host(url, hostname) for url in urls}
+    urls_by_host = defaultdict(list)
+    for url, host in hosts.items():
+        urls_by_host[host].append(url)
+    host_limits = {
+        host: threading.BoundedSemaphore(per_host_limit) for host in urls_by_host
+    }
+
+    def fetch(url):
+        with host_limits[hosts[url]]:
+            return get_local_path(url, task_id=urls[url], **kwargs)
+
+    paths, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # interleave hosts, so threads waiting for a busy host don't hold up downloads from other hosts
+        futures = {
+            url: executor.submit(fetch, url)
+            for host_urls in zip_longest(*urls_by_host.values())
+            for url in host_urls
+            if url is not None
+        }
+        for url in urls:
+            future = futures[url]
+            try:
+                paths[url] = future.result()
+            except Exception as e:
+                logger.debug(f'Prefetch of {url} failed: {e}')
+                errors[url] = e
+    return PrefetchResult(paths, errors)
+
+
+def _url_host(url, hostname):
+    if url.startswith(('http://', 'https://')):
+        return urlparse(url).netloc
+    # uploaded, local and cloud storage files are served by Label Studio
+    return urlparse(hostname).netloc
+
+
 @contextmanager
 def get_temp_dir():
     dirpath = mkdtemp()
@@ -0,0 +1,153 @@
+from collections import namedtuple
+
+from label_studio_tools.core.label_config import (
+    from_name_pattern,
+    parse_config,
+    to_name_pattern,
+)
+
+ResultError = namedtuple('ResultError', ['index', 'field', 'value', 'message'])
+
+# results of these types aren't bound to a control tag
+_SKIPPED_TYPES = {'relation'}
+
+
+class ResultsValidator:
+    """
+    Validator of prediction results built once from a parsed label config:
+    control names, types, to_name values and labels are kept in sets,
+    names with Repeater variables are matched with from_name_pattern and to_name_pattern
+    """
+
+    def __init__(self, config):
+        """
+        :param config: Label config string, parse_config output or LabelConfig
+        """
+        if isinstance(config, str):
+            config = parse_config(config)
+        self._controls = {}
+        # (from_name matcher, control name) of Repeater control tags, e.g. choice_5 for choice_{{idx}}
+        self._from_name_patterns = []
+        for name, tag_info in config.items():
+            pattern = from_name_pattern(name, tag_info)
+            if pattern is not None:
+                self._from_name_patterns.append((pattern, name))
+            labels = None
+            if tag_info.get('labels') and not tag_info.get('dynamic_labels'):
+                labels = frozenset(tag_info['labels'])
+            self._controls[name] = (
+                tag_info['type'].lower(),
+                frozenset(tag_info['to_name']),
+                to_name_pattern(tag_info) if tag_info.get('regex') else None,
+                labels,
+            )
+
+    def validate(self, results):
+        """
+        Check from_name, to_name, type and label values of results
+        :param results: List of annotation or prediction results
+        :return: List of ResultError, empty if all results are valid
+        """
+        errors = []
+        for index, result in enumerate(results):
+            result_type = result.get('type')
+            if result_type in _SKIPPED_TYPES:
+                continue
+            from_name = result.get('from_name')
+            control = self._find_control(from_name)
+            if control is None:
+                errors.append(
+                    ResultError(
+                        index,
+                        'from_name',
+                        from_name,
+                        f'Control tag "{from_name}" is not found in label config',
+                    )
+                )
+                continue
+            control_type, to_names, to_name_matcher, labels = control
+
+            if result_type is None or result_type.lower() != control_type:
+                errors.append(
+                    ResultError(
+                        index,
+                        'type',
+                        result_type,
+                        f'Control tag "{from_name}" has type "{control_type}"',
+                    )
+                )
+
+            to_name = result.get('to_name')
+            if not isinstance(to_name, str) or (
+                to_name not in to_names
+                and (to_name_matcher is None or not to_name_matcher.fullmatch(to_name))
+            ):
+                errors.append(
+                    ResultError(
+                        index,
+                        'to_name',
+                        to_name,
+                        f'Control tag "{from_name}" is not connected to "{to_name}"',
+                    )
+                )
+
+            value = result.get('value')
+            if not isinstance(value, dict):
+                errors.append(
+                    ResultError(index, 'value', value, 'Result value must be a dict')
+                )
+                continue
+            if labels is None or control_type not in value:
+                continue
+            for label in _iter_labels(value[control_type]):
+                if label not in labels:
+                    errors.append(
+                        ResultError(
+                            index,
+                            'value',
+                            label,
+                            f'Label "{label}" is not found in control tag "{from_name}"',
+                        )
+                    )
+        return errors
+
+    def _find_control(self, from_name):
+        if not isinstance(from_name, str):
+            return None
+        control = self._controls.get(from_name)
+        if control is None:
+            for pattern, name in self._from_name_patterns:
+                if pattern.fullmatch(from_name):
+                    return self._controls[name]
+        return control
+
+    def is_valid(self, results):
+        """
+        :param results: List of annotation or prediction results
+        :return: True if all results are valid
+        """
+        return not self.validate(results)
+
+
+def validate_results(config, results):
+    """
+    Validate results against label config, use ResultsValidator to check many batches with one config
+    :param config: Label config string, parse_config output or LabelConfig
+    :param results: List of annotation or prediction results
+    :return: List of ResultError, empty if all results are valid
+    """
+    return ResultsValidator(config).validate(results)
+
+
+def _iter_labels(values):
+    # Taxonomy values are lists of paths, other control tags store plain lists of labels
+    if isinstance(values, str):
+        yield values
+        return
+    if not isinstance(values, (list, tuple)):
+        return
+    for value in values:
+        if isinstance(value, (list, tuple)):
+            yield from _iter_labels(value)
+        elif isinstance(value, str):
+            yield value
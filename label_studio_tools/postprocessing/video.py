@@ -1,44 +1,917 @@
+import json
+import os
+
+from bisect import bisect_left, bisect_right
+from collections import deque
 from copy import deepcopy
-from operator import itemgetter
+from functools import partial
+from itertools import chain, islice, repeat
+
+from label_studio_tools.core.tags import _VIDEO_TRACKING_TAGS
 
-from label_studio_tools.core.label_config import _VIDEO_TRACKING_TAGS
+_BACKENDS = {'python', 'numpy'}
+_FILL_POLICIES = {'end', 'duration', 'skip'}
+_INTERPOLATED_KEYS = ("x", "y", "width", "height", "rotation")
+# deepcopy returns values of these types as they are
+_ATOMIC_TYPES = {str, int, float, bool, type(None)}
 
 
-def extract_key_frames(results):
+def extract_key_frames(
+    results, backend='python', deep_copy=True, fill_policy='end', max_fill_frames=None
+):
     """
     Extract frames from key frames from video annotation results
     :param results: Annotation results
+    :param backend: Interpolation engine, "python" or "numpy" (requires numpy installed),
+      "numpy" computes whole segments between key frames at once, so interpolation itself is 100x+ faster,
+      but building a dict for every frame still takes most of the time: the output is about 5x faster
+      for long videos, use extract_key_frames_columns to get frames as arrays without dicts
+    :param deep_copy: Deep copy video tracking results and every generated frame,
+      if False, results and frames are shallow copies: the output is the same and the input is never mutated,
+      but nested objects (e.g. labels list) are shared with the input
+    :param fill_policy: How frames after the last enabled key frame are filled:
+      "end" - up to framesCount,
+      "duration" - up to the frame derived from the video duration and key frame times (no fill if it can't be derived),
+      "skip" - don't fill
+    :param max_fill_frames: Generate at most this number of frames after the last enabled key frame
     :return: Frames in LS format
     """
+    _check_backend(backend)
+    _check_fill_policy(fill_policy, max_fill_frames)
+    fill = {'fill_policy': fill_policy, 'max_fill_frames': max_fill_frames}
     final_results = []
     for result in results:
-        temp = deepcopy(result)
         if result['type'].lower() not in _VIDEO_TRACKING_TAGS:
             final_results.append(result)
             continue
-        sequence = result['value']['sequence']
-        if len(sequence) < 1:
+        if len(result['value']['sequence']) < 1:
             continue
-        sequence = sorted(sequence, key=lambda d: d['frame'])
-        exclude_first = False
-        for i in range(len(sequence)):
-            frame_a = sequence[i]
+        if deep_copy:
+            temp = deepcopy(result)
+            sequence = _iter_track_frames(
+                temp['value'], copy_key_frames=False, backend=backend, **fill
+            )
+        else:
+            temp = dict(result)
+            temp['value'] = dict(result['value'])
+            sequence = _iter_track_frames(
+                result['value'], backend=backend, deep_copy=False, **fill
+            )
+        temp['value']['sequence'] = list(sequence)
+        final_results.append(temp)
+    return final_results
+
+
+def iter_key_frames(
+    results, backend='python', deep_copy=True, fill_policy='end', max_fill_frames=None
+):
+    """
+    Lazy version of extract_key_frames: interpolated frames are generated on demand,
+    so memory usage doesn't depend on the video length
+    :param results: Annotation results
+    :param backend: Interpolation engine, "python" or "numpy", see extract_key_frames
+    :param deep_copy: Deep copy every generated frame, see extract_key_frames
+    :param fill_policy: How frames after the last enabled key frame are filled, see extract_key_frames
+    :param max_fill_frames: Generate at most this number of frames after the last enabled key frame
+    :return: Generator of results in LS format, where the sequence of every video tracking result
+      is an iterator over its frames ordered by frame number
+    """
+    _check_backend(backend)
+    _check_fill_policy(fill_policy, max_fill_frames)
+    for result in results:
+        if result['type'].lower() not in _VIDEO_TRACKING_TAGS:
+            yield result
+            continue
+        if len(result['value']['sequence']) < 1:
+            continue
+        temp = dict(result)
+        temp['value'] = dict(result['value'])
+        temp['value']['sequence'] = _iter_track_frames(
+            result['value'],
+            backend=backend,
+            deep_copy=deep_copy,
+            fill_policy=fill_policy,
+            max_fill_frames=max_fill_frames,
+        )
+        yield temp
+
+
+def extract_key_frames_columns(results, fill_policy='end', max_fill_frames=None):
+    """
+    Columnar version of extract_key_frames: every video tracking result becomes one TrackColumns object
+    with contiguous numpy arrays instead of a list of frame dicts, other results are skipped
+    :param results: Annotation results
+    :param fill_policy: How frames after the last enabled key frame are filled, see extract_key_frames
+    :param max_fill_frames: Generate at most this number of frames after the last enabled key frame
+    :return: List of TrackColumns
+    """
+    _check_backend('numpy')
+    _check_fill_policy(fill_policy, max_fill_frames)
+    return [
+        TrackColumns.from_result(result, fill_policy, max_fill_frames)
+        for result in results
+        if result['type'].lower() in _VIDEO_TRACKING_TAGS
+        and len(result['value']['sequence']) > 0
+    ]
+
+
+def extract_key_frames_batch(
+    results_iterable,
+    workers=None,
+    chunksize=16,
+    backend='python',
+    deep_copy=True,
+    fill_policy='end',
+    max_fill_frames=None,
+):
+    """
+    Run extract_key_frames for many annotations in a process pool.
+    Small inputs (less than workers * chunksize annotations) are processed in the current process.
+    :param results_iterable: Iterable of annotation results, one list of results per annotation
+    :param workers: Number of worker processes, CPU count by default
+    :param chunksize: Number of annotations sent to a worker at once
+    :param backend: Interpolation engine, "python" or "numpy", see extract_key_frames
+    :param deep_copy: Deep copy results processed in the current process, see extract_key_frames;
+      worker processes always get their own copy of the input, so they never deep copy
+    :param fill_policy: How frames after the last enabled key frame are filled, see extract_key_frames
+    :param max_fill_frames: Generate at most this number of frames after the last enabled key frame
+    :return: Generator of extract_key_frames outputs in the input order
+    """
+    _check_backend(backend)
+    _check_fill_policy(fill_policy, max_fill_frames)
+    workers = workers or os.cpu_count() or 1
+    if chunksize < 1:
+        raise ValueError(f'chunksize must be positive, got {chunksize}')
+    options = {
+        'backend': backend,
+        'fill_policy': fill_policy,
+        'max_fill_frames': max_fill_frames,
+    }
+    return _extract_key_frames_batch(
+        iter(results_iterable), workers, chunksize, deep_copy, options
+    )
+
+
+def _extract_key_frames_batch(results_iterator, workers, chunksize, deep_copy, options):
+    head = list(islice(results_iterator, workers * chunksize))
+    if workers == 1 or len(head) < workers * chunksize:
+        for results in chain(head, results_iterator):
+            yield extract_key_frames(results, deep_copy=deep_copy, **options)
+        return
+
+    # multiprocessing is slow to import, load it only when a pool is needed
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunks = _iter_chunks(chain(head, results_iterator), chunksize)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # keep a bounded number of chunks in flight, so the input is consumed lazily
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_extract_key_frames_chunk, chunk, options))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _extract_key_frames_chunk(chunk, options):
+    return [
+        extract_key_frames(results, deep_copy=False, **options) for results in chunk
+    ]
+
+
+def _iter_chunks(iterable, chunksize):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def estimate_frames_count(result, fill_policy='end', max_fill_frames=None):
+    """
+    Count frames extract_key_frames would produce for a video tracking result,
+    without interpolating them (O(k log k), k is the key frame count)
+    :param result: Video tracking result
+    :param fill_policy: How frames after the last enabled key frame are filled, see extract_key_frames
+    :param max_fill_frames: Generate at most this number of frames after the last enabled key frame
+    :return: Number of frames in the output sequence
+    """
+    _check_fill_policy(fill_policy, max_fill_frames)
+    value = result['value']
+    sequence = sorted(value['sequence'], key=lambda d: d['frame'])
+    count = len(sequence)
+    for i, frame_a in enumerate(sequence):
+        frame_b = {} if i == len(sequence) - 1 else sequence[i + 1]
+        frame_count = _segment_frame_count(
+            frame_a, frame_b, value.get("framesCount", 0)
+        )
+        # key frames are not generated
+        generated = max(0, frame_count - (2 if frame_b else 1))
+        if not frame_b:
+            limit = _fill_limit(frame_a, value, fill_policy, max_fill_frames)
+            if limit is not None:
+                generated = min(generated, limit)
+        count += generated
+    return count
+
+
+def insert_key_frame(result, key_frame, fill_policy='end', max_fill_frames=None):
+    """
+    Add a key frame to an expanded video tracking result (extract_key_frames output) in place,
+    only frames of the segments around the new key frame are recomputed
+    :param result: Video tracking result from extract_key_frames
+    :param key_frame: New key frame in LS format
+    :param fill_policy: How frames after the last enabled key frame are filled, use the same policy as extract_key_frames
+    :param max_fill_frames: Generate at most this number of frames after the last enabled key frame
+    :return: Updated result
+    """
+    _check_fill_policy(fill_policy, max_fill_frames)
+    sequence = result['value']['sequence']
+    start = _bisect_frame(sequence, key_frame['frame'])
+    end = start
+    while end < len(sequence) and sequence[end]['frame'] == key_frame['frame']:
+        if not sequence[end].get('auto'):
+            raise ValueError(
+                f'Key frame {key_frame["frame"]} already exists, use update_key_frame'
+            )
+        end += 1
+    _splice_key_frames(
+        result, start, end, deepcopy(key_frame), fill_policy, max_fill_frames
+    )
+    return result
+
+
+def update_key_frame(result, key_frame, fill_policy='end', max_fill_frames=None):
+    """
+    Replace the key frame with the same frame number in an expanded video tracking result in place,
+    only frames of the segments around the key frame are recomputed
+    :param result: Video tracking result from extract_key_frames
+    :param key_frame: Updated key frame in LS format
+    :param fill_policy: How frames after the last enabled key frame are filled, use the same policy as extract_key_frames
+    :param max_fill_frames: Generate at most this number of frames after the last enabled key frame
+    :return: Updated result
+    """
+    _check_fill_policy(fill_policy, max_fill_frames)
+    index = _find_key_frame(result['value']['sequence'], key_frame['frame'])
+    _splice_key_frames(
+        result, index, index + 1, deepcopy(key_frame), fill_policy, max_fill_frames
+    )
+    return result
+
+
+def delete_key_frame(result, frame, fill_policy='end', max_fill_frames=None):
+    """
+    Remove the key frame from an expanded video tracking result in place,
+    only frames of the segments around the key frame are recomputed
+    :param result: Video tracking result from extract_key_frames
+    :param frame: Frame number of the key frame
+    :param fill_policy: How frames after the last enabled key frame are filled, use the same policy as extract_key_frames
+    :param max_fill_frames: Generate at most this number of frames after the last enabled key frame
+    :return: Updated result
+    """
+    _check_fill_policy(fill_policy, max_fill_frames)
+    index = _find_key_frame(result['value']['sequence'], frame)
+    _splice_key_frames(result, index, index + 1, None, fill_policy, max_fill_frames)
+    return result
+
+
+def _splice_key_frames(
+    result, start, end, key_frame, fill_policy='end', max_fill_frames=None
+):
+    """
+    Replace sequence[start:end] with the key frame (or nothing if it's None)
+    and recompute interpolated frames between the neighbouring key frames
+    """
+    value = result['value']
+    sequence = value['sequence']
+    # "duration" fill depends on the frame rate estimated from timed key frames,
+    # it can't change if the edit keeps the same (time, frame) pairs, e.g. a moved box
+    estimate_kept = _timed_key_frames(sequence[start:end]) == _timed_key_frames(
+        [key_frame] if key_frame is not None else []
+    )
+    # interpolated frames around the changed place belong to the previous key frame segment
+    # and to the changed key frame segment, so they're recomputed up to the next key frame
+    while start > 0 and sequence[start - 1].get('auto'):
+        start -= 1
+    while end < len(sequence) and sequence[end].get('auto'):
+        end += 1
+    previous_key_frame = sequence[start - 1] if start > 0 else None
+    next_key_frame = sequence[end] if end < len(sequence) else {}
+
+    refill = fill_policy == 'duration' and not estimate_kept
+    tail_limit = 0
+    if fill_policy == 'duration' and estimate_kept and not next_key_frame:
+        # the tail is replaced, it keeps its length if the last key frame keeps its frame and state
+        tail_limit = _kept_tail_length(
+            sequence[start:end],
+            previous_key_frame,
+            key_frame if key_frame is not None else previous_key_frame,
+        )
+        refill = tail_limit is None
+
+    frames = []
+    key_frames = [key_frame] if key_frame is not None else []
+    if previous_key_frame is not None:
+        key_frames.insert(0, previous_key_frame)
+    for i, frame_a in enumerate(key_frames):
+        frame_b = key_frames[i + 1] if i < len(key_frames) - 1 else next_key_frame
+        if frame_a is not previous_key_frame:
+            frames.append(frame_a)
+        limit = None
+        if not frame_b:
+            # the fill after the last key frame follows the extraction policy,
+            # "duration" fill is recomputed below when all key frames are known
+            limit = (
+                (0 if refill else tail_limit)
+                if fill_policy == 'duration'
+                else _fill_limit(frame_a, value, fill_policy, max_fill_frames)
+            )
+        frames.extend(
+            _iter_frames_between(
+                frame1=frame_a,
+                frame2=frame_b,
+                frameCount=value.get("framesCount", 0),
+                duration=value.get("duration", 0),
+                limit=limit,
+            )
+        )
+    sequence[start:end] = frames
+    if refill:
+        # the frame rate is estimated from all key frames, so the tail is rebuilt after a full scan
+        _refill_tail(value, max_fill_frames)
+
+
+def _timed_key_frames(frames):
+    # (time, frame) pairs _duration_last_frame estimates the frame rate from
+    return sorted(
+        (frame['time'], frame['frame'])
+        for frame in frames
+        if not frame.get('auto') and (frame.get('time') or 0) > 0
+    )
+
+
+def _kept_tail_length(frames, previous_key_frame, new_last_key_frame):
+    """
+    Length of the frames generated after the last key frame if the edit doesn't change it
+    :param frames: Replaced frames up to the end of the sequence
+    :param previous_key_frame: Key frame before the replaced frames or None
+    :param new_last_key_frame: The last key frame after the edit or None
+    :return: Number of frames or None if the tail must be recomputed
+    """
+    tail = 0
+    old_last_key_frame = previous_key_frame
+    for frame in reversed(frames):
+        if not frame.get('auto'):
+            old_last_key_frame = frame
+            break
+        tail += 1
+    if old_last_key_frame is None or new_last_key_frame is None:
+        return None
+    if (
+        old_last_key_frame['frame'] != new_last_key_frame['frame']
+        or old_last_key_frame['enabled'] != new_last_key_frame['enabled']
+    ):
+        return None
+    return tail
+
+
+def _refill_tail(value, max_fill_frames=None):
+    """
+    Recompute frames after the last key frame of an expanded sequence with "duration" fill policy
+    """
+    sequence = value['sequence']
+    last = len(sequence) - 1
+    while last >= 0 and sequence[last].get('auto'):
+        last -= 1
+    if last < 0:
+        return
+    # generated frames carry interpolated times, the frame rate is taken from key frames only
+    key_frames_value = dict(
+        value, sequence=[frame for frame in sequence if not frame.get('auto')]
+    )
+    sequence[last + 1 :] = _iter_frames_between(
+        frame1=sequence[last],
+        frame2={},
+        frameCount=value.get("framesCount", 0),
+        duration=value.get("duration", 0),
+        limit=_fill_limit(
+            sequence[last], key_frames_value, 'duration', max_fill_frames
+        ),
+    )
+
+
+def _find_key_frame(sequence, frame):
+    index = _bisect_frame(sequence, frame)
+    while index < len(sequence) and sequence[index]['frame'] == frame:
+        if not sequence[index].get('auto'):
+            return index
+        index += 1
+    raise ValueError(f'Key frame {frame} is not found')
+
+
+def _bisect_frame(sequence, frame):
+    """
+    Index of the first item with frame number >= frame in a sequence sorted by frame number
+    """
+    lo, hi = 0, len(sequence)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if sequence[mid]['frame'] < frame:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class TrackColumns:
+    """
+    Interpolated video tracking result stored as a struct of arrays:
+    the i-th frame is (frame[i], x[i], y[i], width[i], height[i], rotation[i], time[i], auto[i], enabled[i]),
+    frames are ordered by frame number. Missing key frame time is stored as NaN.
+    Other result fields (id, labels, from_name, etc.) are kept in `result`, its sequence keeps the key frames
+    sorted by frame number, so to_result restores their other fields (e.g. meta) and value types.
+    """
+
+    columns = (
+        'frame',
+        'x',
+        'y',
+        'width',
+        'height',
+        'rotation',
+        'time',
+        'auto',
+        'enabled',
+    )
+
+    def __init__(self, result, **columns):
+        self.result = result
+        for name in self.columns:
+            setattr(self, name, columns[name])
+
+    @classmethod
+    def from_result(cls, result, fill_policy='end', max_fill_frames=None):
+        """
+        Interpolate video tracking result into columns
+        :param result: Video tracking result in LS format
+        :param fill_policy: How frames after the last enabled key frame are filled, see extract_key_frames
+        :param max_fill_frames: Generate at most this number of frames after the last enabled key frame
+        :return: TrackColumns
+        """
+        np = _import_numpy()
+        value = result['value']
+        sequence = sorted(value['sequence'], key=lambda d: d['frame'])
+        meta = deepcopy({k: v for k, v in result.items() if k != 'value'})
+        meta['value'] = deepcopy({k: v for k, v in value.items() if k != 'sequence'})
+        meta['value']['sequence'] = deepcopy(sequence)
+
+        chunks = {name: [] for name in cls.columns}
+        for i, frame_a in enumerate(sequence):
             frame_b = {} if i == len(sequence) - 1 else sequence[i + 1]
-            temp['value']['sequence'].extend(
-                _construct_result_from_frames(
-                    frame1=frame_a,
-                    frame2=frame_b,
-                    frameCount=result["value"].get("framesCount", 0),
-                    duration=result["value"].get("duration", 0),
-                    exclude_first=exclude_first,
+            for name in cls.columns[:-2]:
+                chunks[name].append([frame_a.get(name, np.nan)])
+            chunks['auto'].append([bool(frame_a.get('auto'))])
+            chunks['enabled'].append([frame_a['enabled']])
+
+            segment = _interpolate_segment(
+                frame_a,
+                frame_b,
+                frameCount=value.get("framesCount", 0),
+                duration=value.get("duration", 0),
+                limit=(
+                    None
+                    if frame_b
+                    else _fill_limit(frame_a, value, fill_policy, max_fill_frames)
+                ),
+            )
+            if segment is None:
+                continue
+            size = len(segment['frame'])
+            for name in cls.columns[:-2]:
+                chunks[name].append(np.broadcast_to(segment[name], (size,)))
+            chunks['auto'].append(np.ones(size, dtype=bool))
+            chunks['enabled'].append(np.ones(size, dtype=bool))
+
+        dtypes = {'frame': np.int64, 'auto': bool, 'enabled': bool}
+        return cls(
+            meta,
+            **{
+                name: np.concatenate(chunks[name]).astype(dtypes.get(name, np.float64))
+                for name in cls.columns
+            },
+        )
+
+    @property
+    def id(self):
+        return self.result.get('id')
+
+    @property
+    def labels(self):
+        return self.result['value'].get('labels')
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __repr__(self):
+        return f'<TrackColumns id={self.id} frames={len(self)}>'
+
+    def to_result(self):
+        """
+        Convert columns back to the extract_key_frames output format,
+        column values equal to the ones computed from key frames keep their original types
+        :return: Video tracking result in LS format
+        """
+        result = deepcopy(self.result)
+        value = result['value']
+        key_frames = value.get('sequence') or []
+        duration = value.get('duration', 0)
+        lists = [getattr(self, name).tolist() for name in self.columns]
+        sequence = []
+        next_index = 0
+        # extra fields and typed constant values of frames generated in the current segment
+        extras, copy_extras, generated = {}, dict, {}
+        for frame, x, y, width, height, rotation, time, auto, enabled in zip(*lists):
+            item = {
+                'frame': frame,
+                'enabled': enabled,
+                'x': x,
+                'y': y,
+                'width': width,
+                'height': height,
+                'rotation': rotation,
+            }
+            if time == time:
+                item['time'] = time
+            # generated frames never have the frame number of the next key frame
+            if (
+                next_index < len(key_frames)
+                and frame == key_frames[next_index]['frame']
+            ):
+                key_frame = key_frames[next_index]
+                next_index += 1
+                next_key_frame = (
+                    key_frames[next_index] if next_index < len(key_frames) else {}
+                )
+                extras = {k: v for k, v in key_frame.items() if k not in self.columns}
+                copy_extras = _deep_frame_copier(extras)
+                generated = _typed_values(
+                    _generated_values(key_frame, next_key_frame, duration)
                 )
+                # the key frame itself with column values
+                expected = _typed_values(key_frame)
+                values, item = item, key_frame
+                item.update(values)
+            else:
+                if extras:
+                    item.update(copy_extras(extras))
+                expected = generated
+            for key, stored in expected.items():
+                # values equal to the stored ones keep their types, e.g. ints
+                if key in item and stored == item[key]:
+                    item[key] = stored
+            if auto:
+                item['auto'] = True
+            elif item.get('auto'):
+                del item['auto']
+            sequence.append(item)
+        value['sequence'] = sequence
+        return result
+
+
+def _typed_values(frame):
+    # floats and missing values are the same in columns and in frames, other types must be restored
+    return {
+        key: value
+        for key, value in frame.items()
+        if key in TrackColumns.columns
+        and value is not None
+        and type(value) is not float
+    }
+
+
+def _generated_values(frame1, frame2, duration=0):
+    """
+    Values of frames generated between 2 key frames which don't change in the segment,
+    see _interpolate_frame, changing values are not included
+    """
+    values = {}
+    for v in _INTERPOLATED_KEYS:
+        if frame1[v] == frame2.get(v) or not frame2:
+            values[v] = frame1[v] + 0
+    if 'time' in frame1 and duration <= 0:
+        if frame1['time'] == frame2.get('time') or not frame2:
+            values['time'] = round(frame1['time'] + 0, 2)
+    return values
+
+
+class VideoTrack:
+    """
+    Random access to frames of one video tracking result without expanding the whole sequence:
+    a frame is found by binary search over sorted key frames and interpolated on demand,
+    following the same rules as extract_key_frames
+    """
+
+    def __init__(self, result):
+        value = result['value']
+        self.result = result
+        self.key_frames = sorted(value['sequence'], key=lambda d: d['frame'])
+        self.frames_count = value.get("framesCount", 0)
+        self.duration = value.get("duration", 0)
+        self._key_frame_numbers = [key_frame['frame'] for key_frame in self.key_frames]
+
+    @property
+    def id(self):
+        return self.result.get('id')
+
+    def box_at(self, frame):
+        """
+        Get the frame as it would be in extract_key_frames output in O(log k), k is the key frame count
+        :param frame: Frame number
+        :return: Frame in LS format or None if the object isn't present on this frame
+        """
+        i = bisect_right(self._key_frame_numbers, frame) - 1
+        if i < 0:
+            return None
+        if self._key_frame_numbers[i] == frame:
+            # key frames with the same frame number are all kept, return the first one
+            i = bisect_left(self._key_frame_numbers, frame)
+            return deepcopy(self.key_frames[i])
+        frame_a = self.key_frames[i]
+        frame_b = {} if i == len(self.key_frames) - 1 else self.key_frames[i + 1]
+        frame_count = _segment_frame_count(frame_a, frame_b, self.frames_count)
+        index = frame - frame_a['frame']
+        if index >= frame_count:
+            return None
+        return _interpolate_frame(frame_a, frame_b, index, frame_count, self.duration)
+
+    def boxes_at(self, frames):
+        """
+        Get several frames, see box_at
+        :param frames: Iterable of frame numbers
+        :return: List of frames in LS format or None for frames where the object isn't present
+        """
+        return [self.box_at(frame) for frame in frames]
+
+    def motion_segments(self, start_frame, end_frame):
+        """
+        Parts of the track where the box moves linearly, intersecting the frame range
+        :param start_frame: First frame of the range
+        :param end_frame: Last frame of the range, included
+        :return: Generator of (first frame, last frame, key frame, segment key frame, next key frame, frame count):
+          the box on the first frame is the key frame, boxes of the other frames are interpolated
+          between the segment key frame and the next key frame ({} for the last one) as in box_at,
+          frame count is the segment frame count from _segment_frame_count
+        """
+        numbers = self._key_frame_numbers
+        i = bisect_right(numbers, start_frame) - 1
+        i = 0 if i < 0 else bisect_left(numbers, numbers[i])
+        while i < len(numbers) and numbers[i] <= end_frame:
+            # several key frames with the same frame number: the first one is shown on this frame,
+            # the last one starts the segment
+            first = i
+            while i + 1 < len(numbers) and numbers[i + 1] == numbers[first]:
+                i += 1
+            frame_a = self.key_frames[i]
+            frame_b = {} if i == len(numbers) - 1 else self.key_frames[i + 1]
+            last_frame = _segment_last_frame(frame_a, frame_b, self.frames_count)
+            if last_frame >= start_frame:
+                yield (
+                    numbers[i],
+                    last_frame,
+                    self.key_frames[first],
+                    frame_a,
+                    frame_b,
+                    _segment_frame_count(frame_a, frame_b, self.frames_count),
+                )
+            i += 1
+
+    def spans(self):
+        """
+        Frame ranges where the object is present: enabled key frames with their interpolated frames
+        and disabled key frames, adjacent ranges are merged
+        :return: List of (first frame, last frame) tuples ordered by frame
+        """
+        spans = []
+        for i, frame_a in enumerate(self.key_frames):
+            frame_b = {} if i == len(self.key_frames) - 1 else self.key_frames[i + 1]
+            start = frame_a['frame']
+            end = _segment_last_frame(frame_a, frame_b, self.frames_count)
+            if spans and start <= spans[-1][1] + 1:
+                spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+            else:
+                spans.append((start, end))
+        return spans
+
+
+class TrackSegments:
+    """
+    Compact representation of an interpolated video tracking result: sorted key frames
+    and segments [first frame, last frame, key frame index, next key frame index or -1]
+    instead of every interpolated frame. Frames are expanded lazily by iter_frames(),
+    frames outside of segments (disabled gaps) are not present in the track.
+    """
+
+    def __init__(self, result, key_frames, segments):
+        self.result = result
+        self.key_frames = key_frames
+        self.segments = segments
+
+    @classmethod
+    def from_result(cls, result):
+        """
+        Encode video tracking result with key frames in LS format
+        :param result: Video tracking result
+        :return: TrackSegments
+        """
+        value = result['value']
+        meta = deepcopy({k: v for k, v in result.items() if k != 'value'})
+        meta['value'] = deepcopy({k: v for k, v in value.items() if k != 'sequence'})
+        key_frames = deepcopy(sorted(value['sequence'], key=lambda d: d['frame']))
+        segments = []
+        for i, frame_a in enumerate(key_frames):
+            frame_b = {} if i == len(key_frames) - 1 else key_frames[i + 1]
+            last = _segment_last_frame(frame_a, frame_b, value.get("framesCount", 0))
+            segments.append([frame_a['frame'], last, i, i + 1 if frame_b else -1])
+        return cls(meta, key_frames, segments)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['result'], data['key_frames'], data['segments'])
+
+    def to_dict(self):
+        """
+        :return: JSON serializable dict, see from_dict
+        """
+        return {
+            'result': self.result,
+            'key_frames': self.key_frames,
+            'segments': self.segments,
+        }
+
+    @classmethod
+    def loads(cls, data):
+        return cls.from_dict(json.loads(data))
+
+    def dumps(self):
+        return json.dumps(self.to_dict(), separators=(',', ':'))
+
+    @property
+    def id(self):
+        return self.result.get('id')
+
+    def __len__(self):
+        return sum(end - start + 1 for start, end, _, _ in self.segments)
+
+    def iter_frames(self, start_frame=None, end_frame=None):
+        """
+        Expand frames lazily, frames are the same as in extract_key_frames output
+        :param start_frame: Skip frames before this frame number
+        :param end_frame: Stop after this frame number
+        :return: Generator of frames in LS format ordered by frame number
+        """
+        value = self.result['value']
+        for start, end, a, b in self.segments:
+            if end_frame is not None and start > end_frame:
+                return
+            if start_frame is not None and end < start_frame:
+                continue
+            frame_a = self.key_frames[a]
+            frame_b = self.key_frames[b] if b >= 0 else {}
+            frame_count = _segment_frame_count(
+                frame_a, frame_b, value.get("framesCount", 0)
             )
-            exclude_first = frame_a['enabled']
-        temp['value']['sequence'] = sorted(
-            temp['value']['sequence'], key=itemgetter('frame')
+            first = start if start_frame is None else max(start, start_frame)
+            last = end if end_frame is None else min(end, end_frame)
+            for frame in range(first, last + 1):
+                if frame == start:
+                    yield deepcopy(frame_a)
+                    continue
+                yield _interpolate_frame(
+                    frame_a,
+                    frame_b,
+                    frame - start,
+                    frame_count,
+                    value.get("duration", 0),
+                )
+
+    def to_result(self):
+        """
+        Expand all frames, see extract_key_frames
+        :return: Video tracking result in LS format
+        """
+        result = deepcopy(self.result)
+        result['value']['sequence'] = list(self.iter_frames())
+        return result
+
+
+def _check_backend(backend):
+    if backend not in _BACKENDS:
+        raise ValueError(
+            f'Unknown interpolation backend "{backend}", use one of {sorted(_BACKENDS)}'
         )
-        final_results.append(temp)
-    return final_results
+    if backend == 'numpy':
+        _import_numpy()
+
+
+def _check_fill_policy(fill_policy, max_fill_frames):
+    if fill_policy not in _FILL_POLICIES:
+        raise ValueError(
+            f'Unknown fill policy "{fill_policy}", use one of {sorted(_FILL_POLICIES)}'
+        )
+    if max_fill_frames is not None and max_fill_frames < 0:
+        raise ValueError(f'max_fill_frames must be >= 0, got {max_fill_frames}')
+
+
+def _fill_limit(key_frame, value, fill_policy='end', max_fill_frames=None):
+    """
+    Max number of frames generated after the last key frame
+    :param key_frame: The last key frame
+    :param value: Result value with sequence, framesCount and duration
+    :param fill_policy: "end", "duration" or "skip", see extract_key_frames
+    :param max_fill_frames: Max number of frames, None if unlimited
+    :return: Number of frames or None if frames are generated up to framesCount
+    """
+    if fill_policy == 'skip':
+        return 0
+    limit = None
+    if fill_policy == 'duration':
+        last_frame = _duration_last_frame(value)
+        limit = 0 if last_frame is None else max(0, last_frame - key_frame['frame'])
+    if max_fill_frames is not None:
+        limit = max_fill_frames if limit is None else min(limit, max_fill_frames)
+    return limit
+
+
+def _duration_last_frame(value):
+    """
+    Estimate the last frame number from the video duration, the frame rate is taken
+    from the key frame with the biggest time (frame = time * fps), the latest one if there are several
+    :param value: Result value with sequence and duration
+    :return: Frame number or None if it can't be estimated
+    """
+    duration = value.get("duration", 0)
+    timed = [frame for frame in value['sequence'] if (frame.get('time') or 0) > 0]
+    if not duration or duration <= 0 or not timed:
+        return None
+    # ties are broken by frame number, so the result doesn't depend on the key frames order
+    key_frame = max(timed, key=lambda frame: (frame['time'], frame['frame']))
+    return int(round(duration * key_frame['frame'] / key_frame['time']))
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(
+            'numpy is required for backend="numpy", install it with `pip install numpy`'
+        )
+    return numpy
+
+
+def _iter_track_frames(
+    value,
+    copy_key_frames=True,
+    backend='python',
+    deep_copy=True,
+    fill_policy='end',
+    max_fill_frames=None,
+):
+    """
+    Iterate over key frames and interpolated frames of one video tracking result
+    :param value: Result value with sequence, framesCount and duration
+    :param copy_key_frames: Yield copies of key frames instead of the original objects
+    :param backend: Interpolation engine, "python" or "numpy"
+    :param deep_copy: Use deep copies of key frames for key frames and generated frames, shallow copies otherwise
+    :param fill_policy: How frames after the last enabled key frame are filled, see extract_key_frames
+    :param max_fill_frames: Generate at most this number of frames after the last enabled key frame
+    :return: Generator of frames ordered by frame number
+    """
+    copy_frame = deepcopy if deep_copy else dict
+    iter_frames_between = partial(
+        _iter_frames_between_numpy if backend == 'numpy' else _iter_frames_between,
+        copy_frame=copy_frame,
+    )
+    sequence = sorted(value['sequence'], key=lambda d: d['frame'])
+    exclude_first = False
+    for i in range(len(sequence)):
+        frame_a = sequence[i]
+        frame_b = {} if i == len(sequence) - 1 else sequence[i + 1]
+        yield copy_frame(frame_a) if copy_key_frames else frame_a
+        yield from iter_frames_between(
+            frame1=frame_a,
+            frame2=frame_b,
+            frameCount=value.get("framesCount", 0),
+            duration=value.get("duration", 0),
+            exclude_first=exclude_first,
+            limit=(
+                None
+                if frame_b
+                else _fill_limit(frame_a, value, fill_policy, max_fill_frames)
+            ),
+        )
+        exclude_first = frame_a['enabled']
 
 
 def _construct_result_from_frames(
@@ -53,43 +926,223 @@ def _construct_result_from_frames(
     :param exclude_first: Exclude first result to deduplicate results
     :return: List of frames
     """
-    final_results = []
+    return list(
+        _iter_frames_between(frame1, frame2, frameCount, duration, exclude_first)
+    )
+
+
+def _iter_frames_between(
+    frame1,
+    frame2,
+    frameCount=0,
+    duration=0,
+    exclude_first=True,
+    copy_frame=deepcopy,
+    limit=None,
+):
+    """
+    Generate frames between 2 keyframes, see _construct_result_from_frames
+    :param copy_frame: Function to copy frame1 into a new frame, deepcopy or dict
+    :param limit: Generate at most this number of frames, the interpolation itself doesn't change
+    """
+    frame_count = _segment_frame_count(frame1, frame2, frameCount)
+    stop = frame_count if limit is None else min(frame_count, limit + 1)
+    start_i = 1 if exclude_first else 0
+    if copy_frame is deepcopy:
+        copy_frame = _deep_frame_copier(frame1)
+    for i in range(start_i, stop):
+        result = _interpolate_frame(
+            frame1, frame2, i, frame_count, duration, copy_frame=copy_frame
+        )
+        if result is not None:
+            yield result
+
+
+def _segment_frame_count(frame1, frame2, frameCount=0):
+    """
+    Count frames in the segment starting at frame1, both key frames included
+    :param frame1: First frame in sequence
+    :param frame2: Next frame in sequence, empty dict if frame1 is the last one
+    :param frameCount: Total frame count in the video
+    :return: Frame count, 0 if nothing should be generated after frame1
+    """
     if not frame1["enabled"]:
-        return []
+        return 0
     if len(frame2) > 0:
         if frame1['frame'] > frame2['frame']:
-            return []
-        frame_count = frame2['frame'] - frame1['frame'] + 1
-    else:
-        frame_count = frameCount - frame1['frame'] + 1
-    start_i = 1 if exclude_first else 0
-    for i in range(start_i, frame_count):
-        frame_number = i + frame1['frame']
-        delta = i / max(1, (frame_count - 1))
-        deltas = {}
-        for v in ["x", "y", "rotation", "width", "height", "time"]:
-            deltas[v] = (
-                0
-                if (frame1[v] == frame2.get(v) or not frame2)
-                else (frame2.get(v, 0) - frame1[v]) * delta
-            )
-        result = deepcopy(frame1)
-        result.update(
-            {
-                "x": frame1["x"] + deltas["x"],
-                "y": frame1["y"] + deltas["y"],
-                "width": frame1["width"] + deltas["width"],
-                "height": frame1["height"] + deltas["height"],
-                "rotation": frame1["rotation"] + deltas["rotation"],
-                "frame": frame_number,
-                "time": round(frame1["time"] + deltas["time"], 2),
-            }
+            return 0
+        return frame2['frame'] - frame1['frame'] + 1
+    return max(0, frameCount - frame1['frame'] + 1)
+
+
+def _segment_last_frame(frame1, frame2, frameCount=0):
+    """
+    Last frame number covered by frame1 and its interpolated frames, frame2 isn't included
+    """
+    frame_count = _segment_frame_count(frame1, frame2, frameCount)
+    last = frame1['frame'] + frame_count - (2 if frame2 else 1)
+    return max(frame1['frame'], last)
+
+
+def _interpolate_frame(frame1, frame2, i, frame_count, duration=0, copy_frame=deepcopy):
+    """
+    Interpolate the i-th frame of the segment between 2 keyframes
+    :param frame1: First frame in sequence
+    :param frame2: Next frame in sequence, empty dict if frame1 is the last one
+    :param i: Frame index in the segment, frame1 has index 0
+    :param frame_count: Segment frame count from _segment_frame_count
+    :param duration: Total duration of the video
+    :param copy_frame: Function to copy frame1 into a new frame, deepcopy or dict
+    :return: Auto frame in LS format or None if i points to a key frame
+    """
+    frame_number = i + frame1['frame']
+    if frame_number in [frame1.get('frame'), frame2.get('frame')]:
+        return None
+    delta = i / max(1, (frame_count - 1))
+    deltas = {}
+    for v in ["x", "y", "rotation", "width", "height", "time"]:
+        deltas[v] = (
+            0
+            if (frame1[v] == frame2.get(v) or not frame2)
+            else (frame2.get(v, 0) - frame1[v]) * delta
         )
-        if frame_number not in [frame1.get('frame'), frame2.get('frame')]:
-            result["auto"] = True
-            if deltas["time"] == 0 and duration > 0:
-                result["time"] = round(
-                    frame1["time"] + delta * (duration - frame1["time"]), 2
-                )
-            final_results.append(result)
-    return final_results
+    result = copy_frame(frame1)
+    result.update(
+        {
+            "x": frame1["x"] + deltas["x"],
+            "y": frame1["y"] + deltas["y"],
+            "width": frame1["width"] + deltas["width"],
+            "height": frame1["height"] + deltas["height"],
+            "rotation": frame1["rotation"] + deltas["rotation"],
+            "frame": frame_number,
+            "time": round(frame1["time"] + deltas["time"], 2),
+            "auto": True,
+        }
+    )
+    if deltas["time"] == 0 and duration > 0:
+        result["time"] = round(frame1["time"] + delta * (duration - frame1["time"]), 2)
+    return result
+
+
+def _iter_frames_between_numpy(
+    frame1,
+    frame2,
+    frameCount=0,
+    duration=0,
+    exclude_first=True,
+    copy_frame=deepcopy,
+    limit=None,
+):
+    """
+    Generate frames between 2 keyframes using values interpolated by _interpolate_segment,
+    the output is the same as for _iter_frames_between.
+    exclude_first is accepted for compatibility: key frames are never generated anyway.
+    :param copy_frame: Function to copy frame1 into a new frame, deepcopy or dict
+    """
+    segment = _interpolate_segment(frame1, frame2, frameCount, duration, limit)
+    if segment is None:
+        return
+    if copy_frame is deepcopy:
+        copy_frame = _deep_frame_copier(frame1)
+    keys = _INTERPOLATED_KEYS + ("frame", "time")
+    columns = [
+        (
+            segment[key].tolist()
+            if hasattr(segment[key], 'tolist')
+            else repeat(segment[key])
+        )
+        for key in keys
+    ]
+    for values in zip(*columns):
+        result = copy_frame(frame1)
+        result.update(zip(keys, values))
+        result["auto"] = True
+        yield result
+
+
+def _deep_frame_copier(frame):
+    """
+    Function making deep copies of the key frame for its generated frames:
+    atomic values are shared as deepcopy does, only nested objects (e.g. meta dicts) are deep copied,
+    so key frames with plain values are copied with dict
+    :param frame: Key frame in LS format
+    :return: Function taking the key frame and returning its deep copy
+    """
+    generated = set(_INTERPOLATED_KEYS + ("frame", "time", "auto"))
+    nested = {
+        key: value
+        for key, value in frame.items()
+        if key not in generated and type(value) not in _ATOMIC_TYPES
+    }
+    if not nested:
+        return dict
+
+    def copy_frame(frame):
+        result = dict(frame)
+        result.update(deepcopy(nested))
+        return result
+
+    return copy_frame
+
+
+def _interpolate_segment(frame1, frame2, frameCount=0, duration=0, limit=None):
+    """
+    Vectorized interpolation of all auto frames between 2 keyframes,
+    it follows the same rules as _construct_result_from_frames
+    :param frame1: First frame in sequence
+    :param frame2: Next frame in sequence
+    :param frameCount: Total frame count in the video
+    :param duration: Total duration of the video
+    :param limit: Generate at most this number of frames, the interpolation itself doesn't change
+    :return: None if there are no frames to generate, otherwise dict with "frame" and "time" arrays
+      and x, y, width, height, rotation which are arrays or scalars if the value doesn't change
+    """
+    np = _import_numpy()
+    frame_count = _segment_frame_count(frame1, frame2, frameCount)
+    # the last index is frame2 itself, it's not generated
+    stop = frame_count - 1 if frame2 else frame_count
+    if limit is not None:
+        stop = min(stop, limit + 1)
+    if stop <= 1:
+        return None
+
+    index = np.arange(1, stop)
+    delta = index / max(1, (frame_count - 1))
+    segment, deltas = {"frame": index + frame1['frame']}, {}
+    for v in _INTERPOLATED_KEYS + ("time",):
+        if frame1[v] == frame2.get(v) or not frame2:
+            deltas[v] = None
+            segment[v] = frame1[v] + 0
+        else:
+            deltas[v] = (frame2.get(v, 0) - frame1[v]) * delta
+            segment[v] = frame1[v] + deltas[v]
+
+    time = segment["time"]
+    if duration > 0:
+        # no time change between key frames: use video duration to estimate time
+        time = np.where(
+            True if deltas["time"] is None else deltas["time"] == 0,
+            frame1["time"] + delta * (duration - frame1["time"]),
+            time,
+        )
+    elif deltas["time"] is None:
+        segment["time"] = round(time, 2)
+        return segment
+    segment["time"] = _round_2(np, time)
+    return segment
+
+
+def _round_2(np, values):
+    """
+    Vectorized round(value, 2) giving exactly the same numbers as python round()
+    """
+    scaled = values * 100
+    rounded = np.rint(scaled) / 100
+    # python round() is correctly rounded, numpy may disagree only near ties,
+    # round such values one by one
+    ties = np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) <= 4 * np.abs(
+        np.spacing(scaled)
+    )
+    if ties.any():
+        rounded[ties] = [round(value, 2) for value in values[ties].tolist()]
+    return rounded
@@ -0,0 +1,236 @@
+import math
+
+from label_studio_tools.core.tags import _VIDEO_TRACKING_TAGS
+from label_studio_tools.postprocessing.video import VideoTrack, _interpolate_frame
+
+
+class VideoTrackIndex:
+    """
+    Frame index over all video tracking results of a task: frame spans of every track are stored
+    in an interval tree, boxes are interpolated only for the frames that are queried.
+    Boxes are compared as axis-aligned rectangles, rotation is ignored.
+    """
+
+    def __init__(self, results):
+        """
+        :param results: Annotation results, only video tracking results with key frames are indexed
+        """
+        self.tracks = [
+            VideoTrack(result)
+            for result in results
+            if result['type'].lower() in _VIDEO_TRACKING_TAGS
+            and len(result['value']['sequence']) > 0
+        ]
+        self._tree = _IntervalTree(
+            [
+                (start, end, track_index)
+                for track_index, track in enumerate(self.tracks)
+                for start, end in track.spans()
+            ]
+        )
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def boxes_at(self, frame):
+        """
+        Find objects present on the frame
+        :param frame: Frame number
+        :return: List of (VideoTrack, frame in LS format) tuples in the results order
+        """
+        return [
+            (self.tracks[track_index], self.tracks[track_index].box_at(frame))
+            for track_index in sorted(set(self._tree.at(frame)))
+        ]
+
+    def tracks_in_range(self, start_frame, end_frame):
+        """
+        Find tracks present on at least one frame of the range
+        :param start_frame: First frame of the range
+        :param end_frame: Last frame of the range, included
+        :return: List of VideoTrack in the results order
+        """
+        return [
+            self.tracks[track_index]
+            for track_index in sorted(
+                set(self._tree.overlapping(start_frame, end_frame))
+            )
+        ]
+
+    def find_overlapping(self, box, start_frame, end_frame):
+        """
+        Find tracks whose box overlaps the given box on at least one frame of the range,
+        boxes move linearly between key frames, so the first overlapping frame of every segment
+        is computed in closed form without interpolating frames one by one
+        :param box: Dict with x, y, width and height in LS format
+        :param start_frame: First frame of the range
+        :param end_frame: Last frame of the range, included
+        :return: List of (VideoTrack, first overlapping frame number) tuples in the results order
+        """
+        found = {}
+        for start, end, track_index in self._tree.overlapping_intervals(
+            start_frame, end_frame
+        ):
+            first, last = max(start, start_frame), min(end, end_frame)
+            if track_index in found and found[track_index] <= first:
+                continue
+            frame = _first_overlapping_frame(self.tracks[track_index], box, first, last)
+            if frame is not None and frame < found.get(track_index, frame + 1):
+                found[track_index] = frame
+        return [(self.tracks[i], found[i]) for i in sorted(found)]
+
+
+def _first_overlapping_frame(track, box, start_frame, end_frame):
+    for segment in track.motion_segments(start_frame, end_frame):
+        first, last, key_frame, frame_a, frame_b, frame_count = segment
+        if first >= start_frame and _boxes_overlap(box, key_frame):
+            return first
+        frame = _first_overlapping_interpolated_frame(
+            box,
+            frame_a,
+            frame_b,
+            frame_count,
+            max(first + 1, start_frame),
+            min(last, end_frame),
+        )
+        if frame is not None:
+            return frame
+    return None
+
+
+def _first_overlapping_interpolated_frame(
+    box, frame_a, frame_b, frame_count, start_frame, end_frame
+):
+    """
+    First frame of [start_frame, end_frame] where the box interpolated between frame_a and frame_b
+    overlaps the given box, the range must not include key frames
+    """
+    if start_frame > end_frame:
+        return None
+    if not frame_b:
+        # boxes after the last key frame don't move
+        return start_frame if _boxes_overlap(box, frame_a) else None
+    # box coordinates are linear in the segment index t: v(t) = a + (b - a) * t / steps
+    steps = max(1, frame_count - 1)
+
+    def slope(key):
+        if frame_a[key] == frame_b[key]:
+            return 0
+        return (frame_b[key] - frame_a[key]) / steps
+
+    x, y, width, height = (frame_a[key] for key in ('x', 'y', 'width', 'height'))
+    dx, dy, dwidth, dheight = (slope(key) for key in ('x', 'y', 'width', 'height'))
+    # overlap conditions of _boxes_overlap as p + q * t > 0
+    conditions = [
+        (x + width - box['x'], dx + dwidth),
+        (box['x'] + box['width'] - x, -dx),
+        (y + height - box['y'], dy + dheight),
+        (box['y'] + box['height'] - y, -dy),
+    ]
+    t_min, t_max = start_frame - frame_a['frame'], end_frame - frame_a['frame']
+    low, high = float('-inf'), float('inf')
+    for p, q in conditions:
+        if q > 0:
+            low = max(low, -p / q)
+        elif q < 0:
+            high = min(high, -p / q)
+        elif p <= 0:
+            return None
+    if low >= high:
+        return None
+    candidate = t_min if low < t_min else math.floor(low) + 1
+    if candidate > t_max or candidate >= high + 1:
+        return None
+
+    def overlaps(t):
+        return _boxes_overlap(
+            box, _interpolate_frame(frame_a, frame_b, t, frame_count, copy_frame=dict)
+        )
+
+    # the closed form can be off by one frame because of float rounding, exact boxes decide
+    for t in range(max(t_min, candidate - 1), min(t_max, candidate + 1) + 1):
+        if overlaps(t):
+            return frame_a['frame'] + t
+    return None
+
+
+def _boxes_overlap(box1, box2):
+    return (
+        box1['x'] < box2['x'] + box2['width']
+        and box2['x'] < box1['x'] + box1['width']
+        and box1['y'] < box2['y'] + box2['height']
+        and box2['y'] < box1['y'] + box1['height']
+    )
+
+
+class _IntervalTree:
+    """
+    Static centered interval tree over closed intervals (start, end, item)
+    """
+
+    def __init__(self, intervals):
+        self._root = self._build(list(intervals))
+
+    @classmethod
+    def _build(cls, intervals):
+        if not intervals:
+            return None
+        points = sorted(p for start, end, _ in intervals for p in (start, end))
+        center = points[len(points) // 2]
+        left, right, here = [], [], []
+        for interval in intervals:
+            if interval[1] < center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        return (
+            center,
+            sorted(here, key=lambda i: i[0]),
+            sorted(here, key=lambda i: i[1], reverse=True),
+            cls._build(left),
+            cls._build(right),
+        )
+
+    def at(self, point):
+        """
+        Items of intervals containing the point
+        """
+        for interval in self.overlapping_intervals(point, point):
+            yield interval[2]
+
+    def overlapping(self, start, end):
+        """
+        Items of intervals intersecting [start, end]
+        """
+        for interval in self.overlapping_intervals(start, end):
+            yield interval[2]
+
+    def overlapping_intervals(self, start, end):
+        """
+        Intervals intersecting [start, end]
+        """
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            center, by_start, by_end, left, right = node
+            if end < center:
+                # all intervals here contain center, so they intersect the range if they start before its end
+                for interval in by_start:
+                    if interval[0] > end:
+                        break
+                    yield interval
+                stack.append(left)
+            elif start > center:
+                for interval in by_end:
+                    if interval[1] < start:
+                        break
+                    yield interval
+                stack.append(right)
+            else:
+                yield from by_start
+                stack.append(left)
+                stack.append(right)
@@ -1,8 +1,24 @@
+import io
+import json
+import os
+
+import pytest
+
 from label_studio_tools.core.label_config import (
     parse_config,
     is_video_object_tracking,
     has_variable,
+    ParseConfigCache,
+    LabelConfig,
+    parse_config_stream,
+    to_name_pattern,
+    from_name_pattern,
+    parse_configs,
+    canonical_config_hash,
+    diff_configs,
+    DiskParseConfigCache,
 )
+from label_studio_tools.core.utils.exceptions import LabelStudioXMLSyntaxErrorSentryIgnored
 
 
 def test_parsing_label_config():
@@ -129,3 +145,289 @@ def test_not_dynamic_labels_parse_config():
     )
     assert not outputs['label'].get('dynamic_labels', False)
     assert 'dynamic_labels' not in outputs['label']
+
+
+def test_parse_config_cache():
+    """
+    Test cached parse_config results, LRU eviction and statistics
+    """
+    label_config = '''
+            <View>
+              <Text name="text" value="$text"></Text>
+              <Choices name="text_class" choice="single" toName="text">
+                <Choice value="class_A"></Choice>
+                <Choice value="class_B"></Choice>
+              </Choices>
+            </View>'''
+    cache = ParseConfigCache(maxsize=2)
+    config = cache.parse(label_config)
+    assert config == parse_config(label_config)
+    # results are copies, mutating them doesn't corrupt the cache
+    config['text_class']['labels'].append('class_C')
+    config['text_class']['labels_attrs']['class_A']['value'] = 'changed'
+    assert cache.parse(label_config) == parse_config(label_config)
+    assert cache.info() == (1, 1, 2, 1)
+
+    cache.parse(label_config.replace('class_B', 'class_D'))
+    cache.parse(label_config.replace('class_B', 'class_E'))
+    assert cache.info().currsize == 2
+    cache.parse(label_config)
+    assert cache.info().misses == 4
+
+    cache.clear()
+    assert cache.info() == (0, 0, 2, 0)
+
+
+def test_label_config_indexes():
+    """
+    Test compiled LabelConfig lookups
+    """
+    config_string = '''
+            <View>
+              <Image name="image" value="$image"/>
+              <Video name="video" value="$video"/>
+              <RectangleLabels name="box" toName="image">
+                <Label value="Car"/>
+                <Label value="Person"/>
+              </RectangleLabels>
+              <Labels name="videoLabels" toName="video">
+                <Label value="Car"/>
+              </Labels>
+              <VideoRectangle name="track" toName="video"/>
+              <Choices name="dynamic" toName="image" value="$options"/>
+            </View>'''
+    label_config = LabelConfig(config_string)
+    assert set(label_config) == {'box', 'videoLabels', 'track', 'dynamic'}
+    assert label_config.inputs_of('box') == ({'type': 'Image', 'value': 'image'},)
+    assert label_config.controls_for_label('Car') == ('box', 'videoLabels')
+    assert label_config.controls_for_label('Bike') == ()
+    assert label_config.controls_of_type('rectanglelabels') == ('box',)
+    assert label_config.controls_of_type('Choices') == ('dynamic',)
+    assert label_config.controls_for_input_value('$video') == ('videoLabels', 'track')
+    assert label_config.is_video_tracking
+    assert is_video_object_tracking(label_config)
+    assert label_config.has_dynamic_labels
+    assert label_config.to_dict() == parse_config(config_string)
+
+    with pytest.raises(AttributeError):
+        label_config.is_video_tracking = False
+    with pytest.raises(TypeError):
+        label_config['box']['labels'] += ('Bike',)
+
+
+def test_parse_config_nested_labels():
+    """
+    Test labels nested under several View levels are assigned to the closest control tag
+    """
+    choices = ''.join(f'<Choice value="choice_{i}"/>' for i in range(5000))
+    label_config = (
+        '<View><Text name="text" value="$text"/>'
+        '<Choices name="taxonomy" toName="text">'
+        + '<View>' * 10 + choices + '</View>' * 10 +
+        '<View><Choices name="inner" toName="text"><View><Choice value="inner_choice"/></View></Choices>'
+        '<Choice value="after_inner"/></View>'
+        '</Choices>'
+        '<View><Label value="orphan"/></View>'
+        '</View>'
+    )
+    config = parse_config(label_config)
+    assert config['taxonomy']['labels'] == [f'choice_{i}' for i in range(5000)] + ['after_inner']
+    assert config['taxonomy']['labels_attrs']['choice_7'] == {'value': 'choice_7'}
+    assert config['inner']['labels'] == ['inner_choice']
+    assert config['inner']['inputs'] == [{'type': 'Text', 'value': 'text'}]
+
+
+def test_parse_config_streaming(tmp_path):
+    """
+    Test streaming parsing gives the same result as parse_config and can skip labels attributes
+    """
+    labels = ''.join(f'<Label value="label_{i}" background="red"/>' for i in range(1000))
+    label_config = (
+        '<View><Image name="image" value="$image"/>'
+        f'<RectangleLabels name="label" toName="image"><View>{labels}</View></RectangleLabels>'
+        '</View>'
+    )
+    expected = parse_config(label_config)
+    assert parse_config(label_config, streaming=True) == expected
+
+    path = tmp_path / 'config.xml'
+    path.write_text(label_config)
+    assert parse_config_stream(str(path)) == expected
+
+    config = parse_config_stream(io.BytesIO(label_config.encode()), collect_labels_attrs=False)
+    assert 'labels_attrs' not in config['label']
+    assert config['label']['labels'] == expected['label']['labels']
+    assert config['label']['inputs'] == expected['label']['inputs']
+
+    with pytest.raises(LabelStudioXMLSyntaxErrorSentryIgnored):
+        parse_config('<View><Image name="image" value="$image"></View>', streaming=True)
+
+
+def test_to_name_matchers():
+    """
+    Test dynamic Repeater to_name values are resolved to their control tags
+    """
+    label_config = """
+    <View>
+      <Image name="image" value="$image"/>
+      <Choices name="global" toName="image"><Choice value="Good"/></Choices>
+      <Repeater on="$images" indexFlag="{{idx}}">
+        <Image name="page_{{idx}}" value="$images[{{idx}}].url"/>
+        <RectangleLabels name="labels_{{idx}}" toName="page_{{idx}}"><Label value="Car"/></RectangleLabels>
+      </Repeater>
+    </View>
+    """
+    parsed = parse_config(label_config)
+    assert to_name_pattern(parsed['labels_{{idx}}']).fullmatch('page_5')
+    assert not to_name_pattern(parsed['labels_{{idx}}']).fullmatch('image')
+    assert to_name_pattern(parsed['global']).fullmatch('image')
+    assert to_name_pattern(parsed['labels_{{idx}}']) is to_name_pattern(parsed['labels_{{idx}}'])
+    assert from_name_pattern('labels_{{idx}}', parsed['labels_{{idx}}']).fullmatch('labels_3')
+    assert not from_name_pattern('labels_{{idx}}', parsed['labels_{{idx}}']).fullmatch('global')
+    assert from_name_pattern('global', parsed['global']) is None
+
+    config = LabelConfig(label_config)
+    assert config.controls_for_to_name('image') == ('global',)
+    assert config.controls_for_to_name('page_12') == ('labels_{{idx}}',)
+    assert config.controls_for_to_name('unknown') == ()
+    assert config.to_name_matcher('labels_{{idx}}').fullmatch('page_0')
+    assert has_variable('$options') and not has_variable('options')
+
+
+def test_parse_configs():
+    """
+    Test configs differing only in whitespace and comments are parsed once
+    """
+    config = (
+        '<View><Image name="image" value="$image"/>'
+        '<Choices name="choice" toName="image"><Choice value="A"/><Choice value="B"/></Choices></View>'
+    )
+    pretty = config.replace('><', '>\n  <').replace('<Choices', '<!-- choices --><Choices')
+    other = config.replace('value="B"', 'value="C"')
+    assert canonical_config_hash(config) == canonical_config_hash(pretty)
+    assert canonical_config_hash(config) != canonical_config_hash(other)
+
+    parsed = parse_configs({'p1': config, 'p2': pretty, 'p3': other, 'p4': ''})
+    assert parsed['p1'] == parse_config(config)
+    assert parsed['p2'] is parsed['p1']
+    assert parsed['p3']['choice']['labels'] == ['A', 'C']
+    assert parsed['p4'] == {}
+
+    configs = {i: other if i % 3 else config.replace('"A"', f'"A{i}"') for i in range(60)}
+    assert parse_configs(configs, workers=2, chunksize=2) == parse_configs(configs)
+
+
+def test_parse_configs_pool_parses_in_workers(monkeypatch):
+    """
+    Test the pool path parses every distinct config string once and only in workers
+    """
+    import concurrent.futures
+    import label_studio_tools.core.label_config as label_config_module
+
+    calls = []
+    in_worker = [False]
+    canonicalize = label_config_module._canonicalize_config
+
+    def counting_canonicalize(config_string):
+        calls.append((config_string, in_worker[0]))
+        return canonicalize(config_string)
+
+    class InProcessExecutor:
+        def __init__(self, max_workers):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            return False
+
+        def map(self, fn, iterable, chunksize=1):
+            for item in iterable:
+                in_worker[0] = True
+                try:
+                    yield fn(item)
+                finally:
+                    in_worker[0] = False
+
+    monkeypatch.setattr(label_config_module, '_canonicalize_config', counting_canonicalize)
+    monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', InProcessExecutor)
+    config = '<View><Image name="image" value="$image"/><Choices name="choice" toName="image"><Choice value="A"/></Choices></View>'
+    configs = {i: config.replace('"A"', f'"A{i % 5}"') for i in range(20)}
+    configs['pretty'] = configs[0].replace('><', '>\n<')
+    parsed = parse_configs(configs, workers=2, chunksize=2)
+
+    assert sorted(config_string for config_string, _ in calls) == sorted(set(configs.values()))
+    assert all(worker for _, worker in calls)
+    assert parsed['pretty'] is parsed[0]
+    assert parsed == {project: parse_config(c) for project, c in configs.items()}
+
+
+def test_diff_configs():
+    """
+    Test added, removed and changed controls, inputs and labels are reported
+    """
+    old_config = parse_config(
+        '<View><Image name="image" value="$image"/><Text name="text" value="$text"/>'
+        '<Choices name="choice" toName="image"><Choice value="A"/><Choice value="B"/></Choices>'
+        '<Labels name="label" toName="text"><Label value="X"/></Labels>'
+        '<TextArea name="old" toName="text"/></View>'
+    )
+    new_config = LabelConfig(
+        '<View><Image name="image" value="$image"/><Text name="text" value="$text"/>'
+        '<Choices name="choice" toName="image,text"><Choice value="A" hotkey="a"/><Choice value="C"/></Choices>'
+        '<Labels name="label" toName="text"><Label value="X"/></Labels>'
+        '<TextArea name="new" toName="text"/></View>'
+    )
+    diff = diff_configs(old_config, new_config)
+    assert diff.added_controls == ['new']
+    assert diff.removed_controls == ['old']
+    assert diff.changed_controls == ['choice']
+    assert diff.added_inputs == {'choice': [{'type': 'Text', 'value': 'text'}]}
+    assert diff.removed_inputs == {}
+    assert diff.added_labels == {'choice': ['C']}
+    assert diff.removed_labels == {'choice': ['B']}
+    assert diff.changed_labels == {'choice': ['A']}
+
+    assert diff_configs(new_config, new_config.to_dict()) == ([], [], [], {}, {}, {}, {}, {})
+
+
+def test_disk_parse_config_cache(tmp_path, monkeypatch):
+    """
+    Test parsed configs are stored on disk and read back by a new cache instance
+    """
+    label_config = '<View><Text name="text" value="$text"/><Labels name="label" toName="text"><Label value="A"/></Labels></View>'
+    disk_cache = DiskParseConfigCache(str(tmp_path))
+    assert disk_cache.get(label_config) is None
+    assert disk_cache.parse(label_config) == parse_config(label_config)
+    # cache files are plain JSON in a directory keyed by the library version and the parser source
+    with open(disk_cache._filepath(label_config), encoding='utf-8') as f:
+        assert json.load(f) == parse_config(label_config)
+    import label_studio_tools.core.label_config as label_config_module
+    assert os.path.basename(disk_cache.path).endswith(label_config_module._parser_source_hash())
+
+    # a new process reads the config from disk without parsing
+    monkeypatch.setattr(label_config_module, 'parse_config', None)
+    new_cache = DiskParseConfigCache(str(tmp_path))
+    assert new_cache.parse(label_config)['label']['labels'] == ['A']
+    assert ParseConfigCache(disk_cache=new_cache).parse(label_config)['label']['labels'] == ['A']
+
+    # broken files are ignored
+    with open(new_cache._filepath(label_config), 'wb') as f:
+        f.write(b'broken')
+    assert new_cache.get(label_config) is None
+    new_cache.clear()
+    assert os.listdir(new_cache.path) == []
+
+
+def test_disk_parse_config_cache_unusable_dir(tmp_path):
+    """
+    Test configs are parsed when the cache dir can't be created
+    """
+    label_config = '<View><Text name="text" value="$text"/><Labels name="label" toName="text"><Label value="A"/></Labels></View>'
+    not_a_dir = tmp_path / 'notadir'
+    not_a_dir.write_text('file')
+    disk_cache = DiskParseConfigCache(str(not_a_dir / 'sub'))
+    assert disk_cache.get(label_config) is None
+    assert disk_cache.parse(label_config) == parse_config(label_config)
+    assert ParseConfigCache(disk_cache=disk_cache).parse(label_config) == parse_config(label_config)
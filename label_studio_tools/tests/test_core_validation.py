@@ -0,0 +1,61 @@
+from label_studio_tools.core.label_config import LabelConfig
+from label_studio_tools.core.validation import (
+    ResultError,
+    ResultsValidator,
+    validate_results,
+)
+
+LABEL_CONFIG = '''
+<View>
+  <Image name="image" value="$image"/>
+  <RectangleLabels name="label" toName="image">
+    <Label value="Car"/>
+    <Label value="Plane"/>
+  </RectangleLabels>
+  <Repeater on="$images" indexFlag="{{idx}}">
+    <Image name="page_{{idx}}" value="$images[{{idx}}].url"/>
+    <Choices name="choice_{{idx}}" toName="page_{{idx}}">
+      <Choice value="Good"/>
+      <Choice value="Bad"/>
+    </Choices>
+  </Repeater>
+  <Choices name="dynamic" toName="image" value="$options"/>
+</View>
+'''
+
+
+def _result(from_name, to_name, type_, value):
+    return {'from_name': from_name, 'to_name': to_name, 'type': type_, 'value': value}
+
+
+def test_validate_results():
+    validator = ResultsValidator(LABEL_CONFIG)
+    results = [
+        _result('label', 'image', 'rectanglelabels', {'x': 1, 'rectanglelabels': ['Car']}),
+        _result('choice_5', 'page_5', 'choices', {'choices': ['Good']}),
+        _result('dynamic', 'image', 'choices', {'choices': ['anything']}),
+        {'type': 'relation', 'from_id': 'a', 'to_id': 'b'},
+    ]
+    assert validator.is_valid(results * 1000)
+
+    errors = validator.validate(
+        [
+            _result('missing', 'image', 'choices', {'choices': ['Good']}),
+            _result('label', 'page_1', 'choices', {'rectanglelabels': ['Car', 'Bike']}),
+            _result('choice_0', 'other_5', 'choices', {'choices': ['Bad', 'Ugly']}),
+            _result('label', 'image', 'rectanglelabels', None),
+        ]
+    )
+    assert [(e.index, e.field, e.value) for e in errors] == [
+        (0, 'from_name', 'missing'),
+        (1, 'type', 'choices'),
+        (1, 'to_name', 'page_1'),
+        (1, 'value', 'Bike'),
+        (2, 'to_name', 'other_5'),
+        (2, 'value', 'Ugly'),
+        (3, 'value', None),
+    ]
+    assert isinstance(errors[0], ResultError)
+
+    # parsed configs are accepted as well
+    assert validate_results(LabelConfig(LABEL_CONFIG), results) == []
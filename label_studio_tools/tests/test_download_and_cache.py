@@ -0,0 +1,261 @@
+import os
+import threading
+import time
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from label_studio_tools.core.utils import io as io_utils
+from label_studio_tools.core.utils.io import (
+    CacheManager,
+    configure_cache,
+    configure_download,
+    configure_session,
+    download_and_cache,
+    get_local_path,
+    get_session,
+    prefetch,
+)
+
+FILE_CONTENT = b'0123456789' * 1000
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests[self.path] += 1
+            count = server.requests[self.path]
+        server.connections.add(self.client_address)
+        if self.path.startswith('/flaky') and count == 1:
+            status, body = 503, b''
+        elif self.path.startswith('/slow'):
+            with server.lock:
+                server.active += 1
+                server.max_active = max(server.max_active, server.active)
+            time.sleep(0.2)
+            with server.lock:
+                server.active -= 1
+            status, body = 200, FILE_CONTENT
+        elif self.path.startswith('/missing'):
+            status, body = 404, b''
+        elif self.path.startswith('/short'):
+            # announce more bytes than sent and close the connection
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(FILE_CONTENT) + 10))
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(FILE_CONTENT)
+            self.close_connection = True
+            return
+        else:
+            status, body = 200, FILE_CONTENT
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.lock = threading.Lock()
+    server.requests = Counter()
+    server.connections = set()
+    server.active = server.max_active = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def session_options():
+    options = dict(io_utils._SESSION_OPTIONS)
+    configure_session(backoff_factor=0)
+    yield
+    configure_session(**options)
+
+
+def _download(url, cache_dir, **kwargs):
+    return download_and_cache(
+        url, str(cache_dir), True, None, None, False, False, **kwargs
+    )
+
+
+def test_download_and_cache_session(http_server, tmp_path):
+    session = get_session()
+    assert get_session() is session
+    for i in range(5):
+        filepath = _download(f'{http_server.url}/file_{i}.jpg', tmp_path)
+        with open(filepath, 'rb') as f:
+            assert f.read() == FILE_CONTENT
+    # keep-alive connection is reused for all downloads
+    assert len(http_server.connections) == 1
+
+    # 5xx responses are retried
+    _download(f'{http_server.url}/flaky.jpg', tmp_path)
+    assert http_server.requests['/flaky.jpg'] == 2
+
+    with pytest.raises(requests.HTTPError):
+        _download(f'{http_server.url}/missing.jpg', tmp_path)
+
+    configure_session(retries=0, pool_maxsize=2)
+    assert get_session() is not session
+    adapter = get_session().get_adapter('http://')
+    assert adapter.max_retries.total == 0
+    with pytest.raises(TypeError):
+        configure_session(unknown=1)
+
+
+def test_download_and_cache_chunks(http_server, tmp_path):
+    filepath = _download(f'{http_server.url}/chunks.jpg', tmp_path, chunk_size=7)
+    with open(filepath, 'rb') as f:
+        assert f.read() == FILE_CONTENT
+
+    # incomplete downloads raise and don't stay in the cache
+    with pytest.raises(IOError):
+        _download(f'{http_server.url}/short.jpg', tmp_path, check_content_length=True)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['.locks', os.path.basename(filepath)]
+
+
+def test_download_options(http_server, tmp_path, monkeypatch):
+    chunk_sizes = []
+    write_response = io_utils._write_response
+
+    def spy(r, filepath, chunk_size, check_content_length):
+        chunk_sizes.append(chunk_size)
+        return write_response(r, filepath, chunk_size, check_content_length)
+
+    monkeypatch.setattr(io_utils, '_write_response', spy)
+    # get_local_path and prefetch pass download options through
+    get_local_path(f'{http_server.url}/option_0.jpg', cache_dir=str(tmp_path), chunk_size=7)
+    result = prefetch(
+        [f'{http_server.url}/short.jpg'], cache_dir=str(tmp_path), check_content_length=True
+    )
+    assert isinstance(result.errors[f'{http_server.url}/short.jpg'], IOError)
+
+    # defaults are read on every call
+    options = dict(io_utils._DOWNLOAD_OPTIONS)
+    configure_download(chunk_size=11, check_content_length=True)
+    try:
+        _download(f'{http_server.url}/option_1.jpg', tmp_path)
+        with pytest.raises(IOError):
+            get_local_path(f'{http_server.url}/short.jpg', cache_dir=str(tmp_path))
+    finally:
+        configure_download(**options)
+    assert chunk_sizes == [7, options['chunk_size'], 11, 11]
+
+    with pytest.raises(TypeError):
+        configure_download(unknown=1)
+    with pytest.raises(ValueError):
+        configure_download(chunk_size=0)
+
+
+def test_download_and_cache_single_flight(http_server, tmp_path):
+    url = f'{http_server.url}/slow.jpg'
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        paths = set(executor.map(lambda _: _download(url, tmp_path), range(8)))
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        paths |= set(executor.map(_download, [url + '?process'] * 4, [tmp_path] * 4))
+    assert http_server.requests['/slow.jpg'] == 1
+    assert http_server.requests['/slow.jpg?process'] == 1
+    assert len(paths) == 2
+    for path in paths:
+        with open(path, 'rb') as f:
+            assert f.read() == FILE_CONTENT
+    # no temp files are left
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+        ['.locks'] + [os.path.basename(p) for p in paths]
+    )
+    assert io_utils._key_locks == {}
+
+
+def test_prefetch(http_server, tmp_path):
+    urls = [f'{http_server.url}/slow_{i}.jpg' for i in range(6)]
+    tasks = [
+        {'id': 1, 'data': {'image': urls[4], 'text': 'not a url'}},
+        {'id': 2, 'data': {'image': '/data/upload/1/slow_upload.jpg'}},
+    ]
+    result = prefetch(
+        urls[:4] + [f'{http_server.url}/missing.jpg'] + tasks + [urls[0]],
+        workers=6,
+        per_host_limit=2,
+        cache_dir=str(tmp_path),
+        hostname=http_server.url,
+        access_token='token',
+        image_dir=str(tmp_path / 'no_upload_dir'),
+    )
+    assert sorted(result.paths) == sorted(urls[:5] + ['/data/upload/1/slow_upload.jpg'])
+    assert list(result.errors) == [f'{http_server.url}/missing.jpg']
+    assert isinstance(result.errors[f'{http_server.url}/missing.jpg'], requests.HTTPError)
+    for path in result.paths.values():
+        with open(path, 'rb') as f:
+            assert f.read() == FILE_CONTENT
+    assert http_server.max_active == 2
+    assert http_server.requests['/slow_0.jpg'] == 1
+
+    result = prefetch(tasks, data_keys=['text'], cache_dir=str(tmp_path))
+    assert list(result.errors) == ['not a url']
+
+
+def test_cache_manager(http_server, tmp_path):
+    # files not created by download_and_cache are never counted or removed
+    (tmp_path / 'notes.txt').write_bytes(FILE_CONTENT)
+    paths = []
+    for i in range(3):
+        paths.append(_download(f'{http_server.url}/cached_{i}.jpg', tmp_path))
+        # distinct modification times even on file systems with coarse timestamps
+        os.utime(paths[-1], (i, i))
+    lock_dir = tmp_path / '.locks'
+    assert len(os.listdir(lock_dir)) == 3
+    cache = CacheManager(str(tmp_path))
+    assert cache.stats() == (3, 3 * len(FILE_CONTENT), None, None)
+    assert cache.evict() == []
+
+    # a hit makes the first file the most recently used one
+    _download(f'{http_server.url}/cached_0.jpg', tmp_path)
+    assert http_server.requests['/cached_0.jpg'] == 1
+    assert CacheManager(str(tmp_path), max_entries=2).evict() == [paths[1]]
+    # lock files of evicted entries are removed
+    assert sorted(os.listdir(lock_dir)) == sorted(
+        os.path.basename(p) + '.lock' for p in (paths[0], paths[2])
+    )
+
+    configure_cache(max_bytes=len(FILE_CONTENT))
+    try:
+        new_path = _download(f'{http_server.url}/cached_3.jpg', tmp_path)
+        assert CacheManager(str(tmp_path)).stats() == (1, len(FILE_CONTENT), None, len(FILE_CONTENT))
+        assert os.path.exists(new_path)
+    finally:
+        configure_cache(max_bytes=None)
+
+    # temp file of an interrupted download and lock file of a failed download
+    orphan = tmp_path / f'.{os.path.basename(new_path)}.1.1.part'
+    orphan.write_bytes(b'partial')
+    with pytest.raises(requests.HTTPError):
+        _download(f'{http_server.url}/missing.jpg', tmp_path)
+
+    # temp files of downloads in progress are kept
+    active = tmp_path / '.0123abcd__active.jpg.1.1.part'
+    active.write_bytes(b'partial')
+    with io_utils._download_lock(str(tmp_path / '0123abcd__active.jpg')):
+        assert cache.purge() == 1
+    assert active.exists()
+    active.unlink()
+
+    assert cache.purge() == 0
+    assert cache.stats().entries == 0
+    assert os.listdir(lock_dir) == []
+    assert sorted(os.listdir(tmp_path)) == ['.locks', 'notes.txt']
@@ -40,4 +40,21 @@ def test_get_local_path(mock_get_data_dir, mock_get_cache_dir, url, expected):
             task_id=1
         )
         print('\n ==> get_local_path = ', x)
-        assert x == expected
\ No newline at end of file
+        assert x == expected
+
+def test_get_local_path_document_root(tmp_path, monkeypatch):
+    from label_studio_tools.core.utils import io
+
+    (tmp_path / 'my_dir').mkdir()
+    (tmp_path / 'my_dir' / '1.jpg').write_bytes(b'image')
+    monkeypatch.setenv('LOCAL_FILES_DOCUMENT_ROOT', str(tmp_path / 'missing'))
+    assert io.LOCAL_FILES_DOCUMENT_ROOT == str(tmp_path / 'missing')
+
+    # assigned module attribute is used instead of the environment variable
+    monkeypatch.setattr(io, 'LOCAL_FILES_DOCUMENT_ROOT', str(tmp_path), raising=False)
+    assert io.get_local_files_document_root() == str(tmp_path)
+    x = get_local_path('/data/local-files?d=my_dir/1.jpg', download_resources=False)
+    assert x == str(tmp_path / 'my_dir' / '1.jpg')
+
+    monkeypatch.delattr(io, 'LOCAL_FILES_DOCUMENT_ROOT')
+    assert io.LOCAL_FILES_DOCUMENT_ROOT == str(tmp_path / 'missing')
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# generous budget of the cumulative import time of a module itself (without the interpreter startup),
+# heavy dependencies alone (requests, lxml, multiprocessing) take more than that
+IMPORT_TIME_BUDGET_US = 100000
+
+
+def _import(module):
+    """
+    Import module in a new interpreter
+    :return: (set of imported module names, cumulative import time of the module in microseconds)
+    """
+    output = subprocess.run(
+        [
+            sys.executable,
+            '-X',
+            'importtime',
+            '-c',
+            f'import sys, {module}; print("\\n".join(sys.modules))',
+        ],
+        check=True,
+        # the package may be importable only through sys.path of the test process, e.g. when it isn't installed
+        env={**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    import_time = None
+    for line in output.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            import_time = int(parts[1])
+    return set(output.stdout.split()), import_time
+
+
+@pytest.mark.parametrize(
+    'module,heavy_modules',
+    [
+        ('label_studio_tools.core.utils.io', {'requests', 'appdirs'}),
+        ('label_studio_tools.core.label_config', {'multiprocessing', 'requests'}),
+        (
+            'label_studio_tools.postprocessing.video',
+            {'lxml', 'numpy', 'requests', 'multiprocessing'},
+        ),
+    ],
+)
+def test_import_time(module, heavy_modules):
+    modules, import_time = _import(module)
+    assert not heavy_modules & modules
+    assert import_time < IMPORT_TIME_BUDGET_US
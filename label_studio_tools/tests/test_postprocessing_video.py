@@ -1,4 +1,20 @@
-from label_studio_tools.postprocessing.video import extract_key_frames
+from copy import deepcopy
+from itertools import islice
+
+import pytest
+
+from label_studio_tools.postprocessing.video import (
+    delete_key_frame,
+    estimate_frames_count,
+    extract_key_frames,
+    extract_key_frames_batch,
+    extract_key_frames_columns,
+    insert_key_frame,
+    iter_key_frames,
+    TrackSegments,
+    update_key_frame,
+    VideoTrack,
+)
 
 
 def test_video_disabled_till_end():
@@ -429,3 +445,588 @@ def test_case_with_1_frame_inside_2_span():
     ]
     key_frames = extract_key_frames(example)[0]['value']['sequence']
     assert len(key_frames) == 294
+
+
+def test_iter_key_frames_same_as_extract_key_frames():
+    """
+    Test lazy frames extraction gives the same frames as extract_key_frames
+    """
+    example = [
+        {
+            "id": "tJhYZLMC9G",
+            "type": "videorectangle",
+            "value": {
+                "labels": ["Airplane"],
+                "framesCount": 20,
+                "duration": 20,
+                "sequence": [
+                    {
+                        "frame": 11,
+                        "enabled": True,
+                        "x": 38,
+                        "y": 38,
+                        "width": 41,
+                        "height": 22,
+                        "rotation": 0,
+                        "time": 11,
+                    },
+                    {
+                        "frame": 1,
+                        "enabled": True,
+                        "x": 38,
+                        "y": 38,
+                        "width": 41,
+                        "height": 22,
+                        "rotation": 0,
+                        "time": 1,
+                    },
+                    {
+                        "frame": 5,
+                        "enabled": False,
+                        "x": 40,
+                        "y": 49,
+                        "width": 41,
+                        "height": 22,
+                        "rotation": 0,
+                        "time": 5,
+                    },
+                ],
+            },
+        },
+        {"id": "choice", "type": "choices", "value": {"choices": ["A"]}},
+    ]
+    expected = extract_key_frames(deepcopy(example))
+    lazy = list(iter_key_frames(example))
+    assert len(lazy) == 2
+    assert list(lazy[0]['value']['sequence']) == expected[0]['value']['sequence']
+    assert lazy[1] == expected[1]
+
+
+def test_iter_key_frames_is_lazy():
+    """
+    Test lazy frames extraction doesn't expand the whole video with enabled last key frame
+    """
+    example = [
+        {
+            "id": "tJhYZLMC9G",
+            "type": "videorectangle",
+            "value": {
+                "labels": ["Airplane"],
+                "framesCount": 10000000,
+                "sequence": [
+                    {
+                        "frame": 1,
+                        "enabled": True,
+                        "x": 38,
+                        "y": 38,
+                        "width": 41,
+                        "height": 22,
+                        "rotation": 0,
+                        "time": 1,
+                    },
+                ],
+            },
+        }
+    ]
+    result = next(iter_key_frames(example))
+    frames = list(islice(result['value']['sequence'], 100))
+    assert [frame['frame'] for frame in frames] == list(range(1, 101))
+    assert all(frame['auto'] for frame in frames[1:])
+    # source sequence stays untouched
+    assert len(example[0]['value']['sequence']) == 1
+
+
+def test_numpy_backend_same_as_python_backend():
+    """
+    Test numpy interpolation engine gives the same frames as the python one
+    """
+    pytest.importorskip('numpy')
+    example = [
+        {
+            "id": "tJhYZLMC9G",
+            "type": "videorectangle",
+            "value": {
+                "labels": ["Airplane"],
+                "framesCount": 40,
+                "duration": 13.3,
+                "sequence": [
+                    {
+                        "frame": 1,
+                        "enabled": True,
+                        "x": 38,
+                        "y": 38.5,
+                        "width": 41,
+                        "height": 22,
+                        "rotation": 0,
+                        "time": 0.33,
+                    },
+                    {
+                        "frame": 12,
+                        "enabled": True,
+                        "x": 12.7,
+                        "y": 38.5,
+                        "width": 41.3,
+                        "height": 22,
+                        "rotation": 45,
+                        "time": 0.33,
+                    },
+                    {
+                        "frame": 20,
+                        "enabled": False,
+                        "x": 40,
+                        "y": 49,
+                        "width": 41,
+                        "height": 22,
+                        "rotation": 0,
+                        "time": 6.66,
+                    },
+                    {
+                        "frame": 25,
+                        "enabled": True,
+                        "x": 1,
+                        "y": 2,
+                        "width": 3,
+                        "height": 4,
+                        "rotation": 5,
+                        "time": 8.33,
+                    },
+                ],
+            },
+        },
+        {"id": "choice", "type": "choices", "value": {"choices": ["A"]}},
+    ]
+    expected = extract_key_frames(deepcopy(example))
+    assert extract_key_frames(deepcopy(example), backend='numpy') == expected
+    lazy = next(iter_key_frames(example, backend='numpy'))
+    assert list(lazy['value']['sequence']) == expected[0]['value']['sequence']
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        extract_key_frames([], backend='cuda')
+
+
+def test_extract_key_frames_columns():
+    """
+    Test columnar frames extraction and conversion back to LS format
+    """
+    pytest.importorskip('numpy')
+    example = [
+        {
+            "id": "tJhYZLMC9G",
+            "type": "videorectangle",
+            "value": {
+                "labels": ["Airplane"],
+                "framesCount": 10,
+                "duration": 10.10,
+                "sequence": [
+                    {
+                        "frame": 5,
+                        "enabled": True,
+                        "x": 40,
+                        "y": 49,
+                        "width": 41,
+                        "height": 22,
+                        "rotation": 0,
+                        "time": 5.05,
+                    },
+                    {
+                        "frame": 1,
+                        "enabled": True,
+                        "x": 38,
+                        "y": 38,
+                        "width": 41,
+                        "height": 22,
+                        "rotation": 0,
+                        "time": 1.01,
+                    },
+                    {
+                        "frame": 3,
+                        "enabled": False,
+                        "x": 38,
+                        "y": 38,
+                        "width": 41,
+                        "height": 22,
+                        "rotation": 0,
+                    },
+                ],
+            },
+        },
+        {"id": "choice", "type": "choices", "value": {"choices": ["A"]}},
+    ]
+    tracks = extract_key_frames_columns(example)
+    assert len(tracks) == 1
+    track = tracks[0]
+    assert track.id == "tJhYZLMC9G"
+    assert track.labels == ["Airplane"]
+    assert len(track) == 9
+    assert track.frame.tolist() == [1, 2, 3, 5, 6, 7, 8, 9, 10]
+    assert track.enabled.tolist() == [True, True, False] + [True] * 6
+    assert track.auto.tolist() == [False, True, False, False] + [True] * 5
+    assert track.x[1] == 38
+    assert track.time[-1] == 10.1
+
+    expected = extract_key_frames(example)[0]
+    assert track.to_result() == expected
+
+
+def test_extract_key_frames_columns_extra_fields():
+    """
+    Test conversion back to LS format keeps extra key frame fields and int values
+    """
+    pytest.importorskip('numpy')
+    example = _video_annotation(10)
+    for key_frame in example[0]['value']['sequence']:
+        key_frame['meta'] = {'text': [f'frame {key_frame["frame"]}']}
+    expected = extract_key_frames(example)[0]['value']['sequence']
+    restored = extract_key_frames_columns(example)[0].to_result()['value']['sequence']
+    assert restored == expected
+    for frame, expected_frame in zip(restored, expected):
+        assert frame['meta'] == expected_frame['meta']
+        assert all(
+            type(frame[key]) is type(expected_frame[key])
+            for key in ('frame', 'x', 'y', 'width', 'height', 'rotation', 'time')
+        )
+
+
+def test_video_track_box_at():
+    """
+    Test random access to frames gives the same frames as extract_key_frames
+    """
+    example = {
+        "id": "tJhYZLMC9G",
+        "type": "videorectangle",
+        "value": {
+            "labels": ["Airplane"],
+            "framesCount": 30,
+            "duration": 30,
+            "sequence": [
+                {
+                    "frame": 11,
+                    "enabled": True,
+                    "x": 38,
+                    "y": 38,
+                    "width": 41,
+                    "height": 22,
+                    "rotation": 0,
+                    "time": 11,
+                },
+                {
+                    "frame": 1,
+                    "enabled": True,
+                    "x": 38,
+                    "y": 38,
+                    "width": 41,
+                    "height": 22,
+                    "rotation": 0,
+                    "time": 1,
+                },
+                {
+                    "frame": 5,
+                    "enabled": False,
+                    "x": 40,
+                    "y": 49,
+                    "width": 41,
+                    "height": 22,
+                    "rotation": 0,
+                    "time": 5,
+                },
+                {
+                    "frame": 15,
+                    "enabled": True,
+                    "x": 40,
+                    "y": 49,
+                    "width": 41,
+                    "height": 22,
+                    "rotation": 0,
+                    "time": 15,
+                },
+            ],
+        },
+    }
+    frames = {
+        frame['frame']: frame
+        for frame in extract_key_frames([deepcopy(example)])[0]['value']['sequence']
+    }
+    track = VideoTrack(example)
+    assert track.box_at(0) is None
+    assert track.box_at(3)['auto']
+    assert track.box_at(7) is None
+    assert track.box_at(31) is None
+    for frame in range(0, 32):
+        assert track.box_at(frame) == frames.get(frame)
+    assert track.boxes_at([1, 7, 13]) == [frames[1], None, frames[13]]
+
+
+def _video_annotation(frames_count):
+    return [
+        {
+            "id": f"track_{frames_count}",
+            "type": "videorectangle",
+            "value": {
+                "labels": ["Airplane"],
+                "framesCount": frames_count,
+                "sequence": [
+                    {
+                        "frame": 1,
+                        "enabled": True,
+                        "x": 38,
+                        "y": 38,
+                        "width": 41,
+                        "height": 22,
+                        "rotation": 0,
+                        "time": 1,
+                    },
+                    {
+                        "frame": 5,
+                        "enabled": True,
+                        "x": 40,
+                        "y": 49,
+                        "width": 41,
+                        "height": 22,
+                        "rotation": 0,
+                        "time": 5,
+                    },
+                ],
+            },
+        }
+    ]
+
+
+@pytest.mark.parametrize("workers,chunksize", [(2, 1), (2, 100), (1, 1)])
+def test_extract_key_frames_batch(workers, chunksize):
+    """
+    Test batch frames extraction keeps the input order in process pool and in-process modes
+    """
+    annotations = [_video_annotation(frames_count) for frames_count in range(5, 15)]
+    expected = [extract_key_frames(deepcopy(results)) for results in annotations]
+    batch = extract_key_frames_batch(
+        iter(annotations), workers=workers, chunksize=chunksize
+    )
+    assert list(batch) == expected
+
+
+@pytest.mark.parametrize("backend", ["python", "numpy"])
+def test_extract_key_frames_without_deep_copy(backend):
+    """
+    Test frames extraction with shallow copies gives the same output and never mutates the input
+    """
+    if backend == 'numpy':
+        pytest.importorskip('numpy')
+    example = _video_annotation(10) + [
+        {"id": "choice", "type": "choices", "value": {"choices": ["A"]}}
+    ]
+    source = deepcopy(example)
+    expected = extract_key_frames(deepcopy(example))
+    key_frames = extract_key_frames(example, backend=backend, deep_copy=False)
+    assert key_frames == expected
+    assert example == source
+
+    # output frames are independent from the input key frames
+    for frame in key_frames[0]['value']['sequence']:
+        frame['x'] = -1
+    key_frames[0]['value']['sequence'].clear()
+    assert example == source
+
+
+@pytest.mark.parametrize("backend", ["python", "numpy"])
+def test_extract_key_frames_deep_copy(backend):
+    """
+    Test generated frames don't share nested objects with the input key frames by default
+    """
+    if backend == 'numpy':
+        pytest.importorskip('numpy')
+    example = _video_annotation(10)
+    for key_frame in example[0]['value']['sequence']:
+        key_frame['meta'] = {'text': ['note']}
+    input_meta = [frame['meta'] for frame in example[0]['value']['sequence']]
+    frames = list(next(iter_key_frames(example, backend=backend))['value']['sequence'])
+    assert len(frames) == 10
+    assert all(
+        frame['meta'] == {'text': ['note']}
+        and all(frame['meta'] is not meta for meta in input_meta)
+        for frame in frames
+    )
+    # generated frames don't share nested objects with each other
+    assert len({id(frame['meta']['text']) for frame in frames}) == len(frames)
+
+
+def test_track_segments():
+    """
+    Test segment encoding keeps disabled gaps, survives serialization and expands lazily
+    """
+    example = {
+        "id": "tJhYZLMC9G",
+        "type": "videorectangle",
+        "value": {
+            "labels": ["Airplane"],
+            "framesCount": 10000000,
+            "duration": 22,
+            "sequence": [
+                {
+                    "frame": 11,
+                    "enabled": True,
+                    "x": 38,
+                    "y": 38,
+                    "width": 41,
+                    "height": 22,
+                    "rotation": 0,
+                    "time": 11,
+                },
+                {
+                    "frame": 1,
+                    "enabled": True,
+                    "x": 38,
+                    "y": 38,
+                    "width": 41,
+                    "height": 22,
+                    "rotation": 0,
+                    "time": 1,
+                },
+                {
+                    "frame": 5,
+                    "enabled": False,
+                    "x": 40,
+                    "y": 49,
+                    "width": 41,
+                    "height": 22,
+                    "rotation": 0,
+                    "time": 5,
+                },
+                {
+                    "frame": 15,
+                    "enabled": False,
+                    "x": 40,
+                    "y": 49,
+                    "width": 41,
+                    "height": 22,
+                    "rotation": 0,
+                    "time": 15,
+                },
+            ],
+        },
+    }
+    segments = TrackSegments.from_result(example)
+    assert segments.segments == [
+        [1, 4, 0, 1],
+        [5, 5, 1, 2],
+        [11, 14, 2, 3],
+        [15, 15, 3, -1],
+    ]
+
+    restored = TrackSegments.loads(segments.dumps())
+    assert restored.id == "tJhYZLMC9G"
+    assert len(restored) == 10
+    expected = extract_key_frames([deepcopy(example)])[0]
+    assert restored.to_result() == expected
+    frames = list(restored.iter_frames(4, 12))
+    assert [frame['frame'] for frame in frames] == [4, 5, 11, 12]
+    assert frames == expected['value']['sequence'][3:7]
+
+
+def test_incremental_key_frame_edits():
+    """
+    Test inserting, updating and deleting key frames in an expanded track
+    gives the same frames as the full extraction
+    """
+    example = _video_annotation(30)
+    expanded = extract_key_frames(deepcopy(example))[0]
+    sequence = example[0]['value']['sequence']
+
+    new_key_frame = {
+        "frame": 10,
+        "enabled": False,
+        "x": 10,
+        "y": 10,
+        "width": 10,
+        "height": 10,
+        "rotation": 0,
+        "time": 10,
+    }
+    insert_key_frame(expanded, new_key_frame)
+    sequence.append(deepcopy(new_key_frame))
+    assert expanded == extract_key_frames(deepcopy(example))[0]
+    assert len(expanded['value']['sequence']) == 10
+
+    new_key_frame["enabled"] = True
+    update_key_frame(expanded, new_key_frame)
+    sequence[-1]["enabled"] = True
+    assert expanded == extract_key_frames(deepcopy(example))[0]
+    assert len(expanded['value']['sequence']) == 30
+
+    delete_key_frame(expanded, 5)
+    del sequence[1]
+    assert expanded == extract_key_frames(deepcopy(example))[0]
+
+    with pytest.raises(ValueError):
+        insert_key_frame(expanded, new_key_frame)
+    with pytest.raises(ValueError):
+        delete_key_frame(expanded, 5)
+
+
+@pytest.mark.parametrize(
+    "fill_policy,max_fill_frames,frames_count",
+    [
+        ("end", None, 10000000),
+        ("end", 10, 15),
+        ("duration", None, 100),
+        ("duration", 10, 15),
+        ("skip", None, 5),
+        ("skip", 10, 5),
+    ],
+)
+def test_fill_policy(fill_policy, max_fill_frames, frames_count):
+    """
+    Test frames after the last enabled key frame are filled according to the policy
+    and the frame count is estimated before extraction
+    """
+    example = _video_annotation(10000000)
+    # 10 frames per second: the video is 10 seconds, so the duration derived last frame is 100
+    example[0]['value']['duration'] = 10
+    for key_frame in example[0]['value']['sequence']:
+        key_frame['time'] = key_frame['frame'] / 10
+
+    assert (
+        estimate_frames_count(example[0], fill_policy, max_fill_frames) == frames_count
+    )
+    if frames_count > 1000:
+        return
+    key_frames = extract_key_frames(
+        example, fill_policy=fill_policy, max_fill_frames=max_fill_frames
+    )[0]['value']['sequence']
+    assert len(key_frames) == frames_count
+    assert key_frames[-1]['frame'] == frames_count
+    assert all(frame['auto'] for frame in key_frames[5:])
+
+
+def test_unknown_fill_policy():
+    with pytest.raises(ValueError):
+        extract_key_frames([], fill_policy='forever')
+    with pytest.raises(ValueError):
+        estimate_frames_count(_video_annotation(10)[0], max_fill_frames=-1)
+
+
+@pytest.mark.parametrize(
+    "fill_policy,max_fill_frames", [("skip", None), ("end", 10), ("duration", None)]
+)
+def test_key_frame_edits_keep_fill_policy(fill_policy, max_fill_frames):
+    """
+    Test edits of a truncated track don't fill it up to framesCount
+    """
+    example = _video_annotation(1000000)
+    example[0]['value']['duration'] = 10
+    for key_frame in example[0]['value']['sequence']:
+        key_frame['time'] = key_frame['frame'] / 10
+    options = {'fill_policy': fill_policy, 'max_fill_frames': max_fill_frames}
+    result = extract_key_frames(example, **options)[0]
+
+    last_key_frame = dict(example[0]['value']['sequence'][-1], x=60)
+    new_key_frame = dict(last_key_frame, frame=50, time=5)
+    update_key_frame(result, last_key_frame, **options)
+    insert_key_frame(result, new_key_frame, **options)
+    delete_key_frame(result, 1, **options)
+
+    example[0]['value']['sequence'] = [last_key_frame, new_key_frame]
+    expected = extract_key_frames(example, **options)[0]
+    assert result == expected
+    assert len(result['value']['sequence']) < 1000
@@ -0,0 +1,103 @@
+from label_studio_tools.postprocessing.video import extract_key_frames
+from label_studio_tools.postprocessing.video_index import VideoTrackIndex
+
+
+def _track(track_id, sequence, frames_count=100):
+    return {
+        "id": track_id,
+        "type": "videorectangle",
+        "value": {
+            "labels": ["Car"],
+            "framesCount": frames_count,
+            "sequence": [
+                {
+                    "frame": frame,
+                    "enabled": enabled,
+                    "x": x,
+                    "y": 10,
+                    "width": 10,
+                    "height": 10,
+                    "rotation": 0,
+                    "time": frame / 10,
+                }
+                for frame, enabled, x in sequence
+            ],
+        },
+    }
+
+
+RESULTS = [
+    _track("a", [(1, True, 0), (11, False, 50)]),
+    _track("b", [(5, True, 80), (20, False, 80), (40, True, 0), (60, False, 0)]),
+    {"id": "c", "type": "choices", "value": {"choices": ["Day"]}},
+    _track("d", [(90, True, 20)]),
+]
+
+
+def test_video_track_index_boxes_at():
+    """
+    Test objects on a frame are the same as in extract_key_frames output
+    """
+    index = VideoTrackIndex(RESULTS)
+    assert len(index) == 3
+    expanded = extract_key_frames(RESULTS)
+    for frame in range(0, 102):
+        expected = [
+            (result['id'], box)
+            for result in expanded
+            if result['type'] == 'videorectangle'
+            for box in result['value']['sequence']
+            if box['frame'] == frame
+        ]
+        found = [(track.id, box) for track, box in index.boxes_at(frame)]
+        assert found == expected
+
+
+def test_video_track_index_ranges():
+    """
+    Test tracks in frame ranges and overlapping a box
+    """
+    index = VideoTrackIndex(RESULTS)
+    assert [t.id for t in index.tracks_in_range(21, 39)] == []
+    assert [t.id for t in index.tracks_in_range(0, 5)] == ["a", "b"]
+    assert [t.id for t in index.tracks_in_range(95, 200)] == ["d"]
+
+    box = {"x": 45, "y": 12, "width": 5, "height": 5}
+    # track "a" moves from x=0 to x=50 by 5 per frame, it overlaps the box from frame 9 (x=40)
+    assert [(t.id, frame) for t, frame in index.find_overlapping(box, 0, 30)] == [
+        ("a", 9)
+    ]
+    assert index.find_overlapping(box, 41, 60) == []
+
+
+def test_video_track_index_find_overlapping_long_segments():
+    """
+    Test first overlapping frames computed per segment match boxes interpolated frame by frame
+    """
+    results = [
+        _track("e", [(1, True, 0), (1001, True, 100), (2001, True, 3)], 3000),
+        _track("f", [(500, True, 33.3), (500, True, 90), (2500, False, 0.5)], 3000),
+    ]
+    index = VideoTrackIndex(results)
+    boxes = [
+        {"x": 0, "y": 0, "width": 100, "height": 100},
+        {"x": 45, "y": 12, "width": 5, "height": 5},
+        {"x": 89.95, "y": 19.99, "width": 0.1, "height": 1},
+        {"x": 95, "y": 25, "width": 5, "height": 5},
+    ]
+    for box in boxes:
+        for start_frame, end_frame in [(0, 3000), (700, 1500), (2400, 2999)]:
+            expected = []
+            for track in index.tracks:
+                for frame in range(start_frame, end_frame + 1):
+                    current = track.box_at(frame)
+                    if current is not None and (
+                        box["x"] < current["x"] + current["width"]
+                        and current["x"] < box["x"] + box["width"]
+                        and box["y"] < current["y"] + current["height"]
+                        and current["y"] < box["y"] + box["height"]
+                    ):
+                        expected.append((track.id, frame))
+                        break
+            found = index.find_overlapping(box, start_frame, end_frame)
+            assert [(t.id, frame) for t, frame in found] == expected